@@ -33,6 +33,17 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+import pytest
+from django.test import override_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def media_root(tmp_path_factory):
+    # Картинки постов из фикстур пишутся во временный каталог.
+    with override_settings(MEDIA_ROOT=str(tmp_path_factory.mktemp('media'))):
+        yield
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
@@ -1,9 +1,11 @@
+from django.core.cache import cache
 from django.test import Client
 from django.test.testcases import TestCase
 
 
 class StaticURLTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_about_author(self):
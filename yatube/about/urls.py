@@ -1,10 +1,20 @@
 from django.urls import path
 
+from core.page_cache import cache_page_body
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/',
+        cache_page_body(views.AboutAuthorView.as_view()),
+        name='author'
+    ),
+    path(
+        'tech/',
+        cache_page_body(views.AboutTechView.as_view()),
+        name='tech'
+    ),
 ]
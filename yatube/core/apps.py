@@ -1,5 +1,29 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def check_shared_cache():
+    """Без DEBUG кеш по умолчанию должен быть общим для процессов."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DEBUG and backend.endswith('.LocMemCache'):
+        raise ImproperlyConfigured(
+            f'{backend} не виден другим процессам сервера: сброс кеша '
+            'лент и страниц дойдет только до одного из них. Укажите '
+            'общий кеш в YATUBE_CACHE_BACKEND.'
+        )
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        check_shared_cache()
+        from django.db.backends.signals import connection_created
+
+        from .db import configure_connection
+        connection_created.connect(
+            configure_connection, dispatch_uid='core.configure_connection')
+        if settings.TEMPLATE_CACHE:
+            from .template_cache import warm_templates
+            warm_templates()
@@ -0,0 +1,122 @@
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import slow_queries
+
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+# Кука ставится после записи, пока она жива, чтение идет с основной базы.
+PRIMARY_COOKIE = 'db_primary'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def apply_sqlite_pragmas(connection, pragmas=None):
+    """Выполняет прагмы SQLite на соединении, возвращает их итог.
+
+    Значения подставляются в текст запроса, поэтому принимаются только
+    числа и слова: прагмы не поддерживают параметры.
+    """
+    if connection.vendor != 'sqlite':
+        return {}
+    if pragmas is None:
+        pragmas = settings.SQLITE_PRAGMAS
+    applied = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not (name.isidentifier() and PRAGMA_VALUE.match(str(value))):
+                raise ValueError(f'Недопустимая прагма SQLite: {name}={value}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(f'PRAGMA {name}')
+                row = cursor.fetchone()
+            applied[name] = row[0] if row else None
+    return applied
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: настраивает каждое новое соединение."""
+    apply_sqlite_pragmas(connection)
+    slow_queries.install(connection)
+
+
+@contextmanager
+def use_replica():
+    """Внутри блока чтение моделей из DATABASE_REPLICA_APPS идет с реплик."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def reading_replica():
+    """Идет ли чтение в этом контексте с реплик."""
+    return bool(settings.DATABASE_REPLICAS) and _use_replica.get()
+
+
+def read_from_replica(view):
+    """Отдает чтение GET-запросов view репликам.
+
+    Пока у пользователя есть кука PRIMARY_COOKIE, он читает с основной
+    базы и видит свою запись, даже если реплика еще не догнала.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or primary_pin(request):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def primary_pin(request):
+    """Метка последней записи пользователя, если он читает с основной базы.
+
+    Страницы и фрагменты, нарисованные с реплики, могут отставать от его
+    записи, поэтому такие запросы не берут их из общего кеша.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return ''
+    return request.COOKIES.get(PRIMARY_COOKIE, '')
+
+
+def pin_primary(response):
+    """Закрепляет чтение за основной базой на DATABASE_PRIMARY_PIN_SECONDS."""
+    if settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            PRIMARY_COOKIE, str(int(time.time() * 1000)),
+            max_age=settings.DATABASE_PRIMARY_PIN_SECONDS, httponly=True
+        )
+    return response
+
+
+class ReplicaRouter:
+    """Пишет в основную базу, читает с реплик внутри use_replica()."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not _use_replica.get()
+                or model._meta.app_label not in
+                settings.DATABASE_REPLICA_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема и данные приходят на реплику вместе с копией базы.
+        return db not in settings.DATABASE_REPLICAS
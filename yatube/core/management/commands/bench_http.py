@@ -0,0 +1,314 @@
+"""Замер маршрутов сайта.
+
+Запросы идут через тестовый клиент Django (django.test.Client): он
+проходит весь стек middleware и хранит сессии и куки, поэтому команда
+зависит от django.test, хотя и работает с рабочей базой и кешем.
+"""
+import gc
+import json
+import math
+import platform
+import time
+import uuid
+from collections import namedtuple
+
+import django
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+BENCH_USERNAME = 'bench_http_user'
+BENCH_PASSWORD = 'bench-http-password'
+# Разница меньше этой считается шумом, даже если в процентах она большая.
+MIN_LATENCY_DELTA_MS = 0.5
+
+
+class CacheNamespace:
+    """Свое пространство ключей в настроенном кеше на время замера.
+
+    Замер идет через тот же бэкенд, что и сайт, но с отдельным префиксом
+    ключей. Записанные ключи запоминаются, и clear() удаляет только их:
+    кеш работающего сайта остается нетронутым.
+    """
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+        self.keys = set()
+
+    def __enter__(self):
+        self.key_prefix = self.cache.key_prefix
+        self.make_key = self.cache.make_key
+        self.cache.key_prefix = (
+            f'{self.key_prefix}bench_http:{uuid.uuid4().hex}')
+
+        def make_key(key, version=None):
+            self.keys.add((key, version))
+            return self.make_key(key, version)
+
+        self.cache.make_key = make_key
+        return self
+
+    def clear(self):
+        for key, version in list(self.keys):
+            self.cache.delete(key, version)
+        self.keys = set()
+
+    def __exit__(self, *exc_info):
+        self.clear()
+        del self.cache.make_key
+        self.cache.key_prefix = self.key_prefix
+
+
+Route = namedtuple('Route', 'name method path data client')
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * percent / 100))
+    return ordered[rank - 1]
+
+
+def summarize(timings, queries, size, status):
+    return {
+        'p50': round(percentile(timings, 50), 3),
+        'p95': round(percentile(timings, 95), 3),
+        'p99': round(percentile(timings, 99), 3),
+        'mean': round(sum(timings) / len(timings), 3),
+        'queries': queries,
+        'bytes': size,
+        'status': status,
+    }
+
+
+def compare(current, baseline, threshold, tail_threshold):
+    """Список регрессий маршрутов current относительно baseline.
+
+    Задержка считается регрессией, если p50 вырос больше чем на threshold
+    или p95 больше чем на tail_threshold (хвост шумит сильнее), и при
+    этом больше чем на MIN_LATENCY_DELTA_MS. Любой лишний запрос к базе
+    и рост ответа больше чем на threshold - тоже.
+    """
+    regressions = []
+    for name, result in current['routes'].items():
+        old = baseline['routes'].get(name)
+        if old is None:
+            continue
+        for metric, limit in (('p50', threshold), ('p95', tail_threshold)):
+            if (result[metric] > old[metric] * (1 + limit)
+                    and result[metric] - old[metric] > MIN_LATENCY_DELTA_MS):
+                regressions.append(
+                    f'{name}: {metric} {old[metric]} -> {result[metric]} мс')
+        if result['queries'] > old['queries']:
+            regressions.append(
+                f'{name}: запросов {old["queries"]} -> {result["queries"]}')
+        if result['bytes'] > old['bytes'] * (1 + threshold):
+            regressions.append(
+                f'{name}: ответ {old["bytes"]} -> {result["bytes"]} байт')
+        if result['status'] != old['status']:
+            regressions.append(
+                f'{name}: статус {old["status"]} -> {result["status"]}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число запросов и размер ответа каждого '
+        'маршрута на текущей базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Сколько первых запросов маршрута не учитывать'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--routes', nargs='+', metavar='NAME',
+            help='Замерить только эти маршруты'
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON')
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='JSON прошлого замера: найти регрессии относительно него'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p50 и размера ответа, доля'
+        )
+        parser.add_argument(
+            '--tail-threshold', type=float, default=0.5,
+            help='Допустимый рост p95, доля'
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').first()
+        group = Group.objects.order_by('-posts_count').first()
+        if post is None or group is None:
+            raise CommandError(
+                'В базе нет постов или групп, заполните ее: manage.py seed')
+        author = User.objects.order_by('-stats__posts_count').first()
+        # Замер пишет в базу (свой автор, новые посты), поэтому все идет
+        # в одной транзакции, которая в конце откатывается. Реплики не
+        # видят незакоммиченных строк, поэтому чтение идет с основной базы.
+        # В пространстве ключей замера остаются страницы с откаченными
+        # постами, при выходе оно очищается.
+        with override_settings(DATABASE_REPLICAS=[]), \
+                CacheNamespace() as self.namespace:
+            with transaction.atomic():
+                results = self.run(options, post, group, author)
+                transaction.set_rollback(True)
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'posts': Post.objects.count(),
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+            },
+            'routes': results,
+        }
+        self.print_report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                regressions = compare(
+                    report, json.load(baseline), options['threshold'],
+                    options['tail_threshold']
+                )
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(line))
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def build_routes(self, post, group, author, own_post):
+        edit_path = reverse(
+            'posts:post_edit', kwargs={'post_id': own_post.pk})
+        login = {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}
+        # Сначала чтение: запись сбрасывает кеш лент.
+        return [
+            Route('posts:index', 'get', reverse('posts:index'),
+                  None, 'anonymous'),
+            Route('posts:index:author', 'get', reverse('posts:index'),
+                  None, 'author'),
+            Route('posts:index:deep', 'get',
+                  reverse('posts:index') + '?page=50', None, 'anonymous'),
+            Route('posts:group_list', 'get', reverse(
+                'posts:group_list', kwargs={'slug': group.slug}),
+                None, 'anonymous'),
+            Route('posts:profile', 'get', reverse(
+                'posts:profile', kwargs={'username': author.username}),
+                None, 'anonymous'),
+            Route('posts:post_detail', 'get', reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}),
+                None, 'anonymous'),
+            Route('posts:post_detail:author', 'get', reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}),
+                None, 'author'),
+            Route('posts:search', 'get',
+                  reverse('posts:search') + '?q=пост', None, 'anonymous'),
+            Route('about:author', 'get', reverse('about:author'),
+                  None, 'anonymous'),
+            Route('about:tech', 'get', reverse('about:tech'),
+                  None, 'anonymous'),
+            Route('users:login', 'get', reverse('users:login'),
+                  None, 'anonymous'),
+            Route('users:signup', 'get', reverse('users:signup'),
+                  None, 'anonymous'),
+            Route('posts:post_create', 'get', reverse('posts:post_create'),
+                  None, 'author'),
+            Route('posts:post_edit', 'get', edit_path, None, 'author'),
+            Route('users:login:post', 'post', reverse('users:login'),
+                  login, 'fresh'),
+            Route('users:logout', 'get', reverse('users:logout'),
+                  None, 'fresh_author'),
+            Route('posts:post_create:post', 'post',
+                  reverse('posts:post_create'),
+                  {'text': 'Пост из замера', 'group': group.pk}, 'author'),
+            Route('posts:post_edit:post', 'post', edit_path,
+                  {'text': 'Правка из замера', 'group': group.pk}, 'author'),
+        ]
+
+    def run(self, options, post, group, author):
+        bench_user = User.objects.create_user(
+            username=BENCH_USERNAME, password=BENCH_PASSWORD)
+        own_post = Post.objects.create(
+            text='Пост для правки', author=bench_user, group=group)
+        clients = {'anonymous': Client(), 'author': Client()}
+        clients['author'].force_login(bench_user)
+        routes = self.build_routes(post, group, author, own_post)
+        if options['routes']:
+            routes = [
+                route for route in routes if route.name in options['routes']]
+        results = {}
+        for route in routes:
+            # Сборка мусора посреди замера дает выбросы в p95 и p99.
+            gc.collect()
+            gc.disable()
+            try:
+                timings = self.time_route(route, clients, bench_user, options)
+            finally:
+                gc.enable()
+            # Запросы считаются отдельным прогоном, чтобы их запись
+            # не попала в замер задержки.
+            client = self.get_client(route, clients, bench_user)
+            if options['cold']:
+                self.namespace.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, route.method)(
+                    route.path, route.data)
+            results[route.name] = summarize(
+                timings, len(queries), len(response.content),
+                response.status_code
+            )
+        return results
+
+    def time_route(self, route, clients, bench_user, options):
+        """Задержки маршрута в миллисекундах без прогревочных запросов."""
+        timings = []
+        for number in range(options['warmup'] + options['iterations']):
+            client = self.get_client(route, clients, bench_user)
+            if options['cold']:
+                self.namespace.clear()
+            started = time.perf_counter()
+            getattr(client, route.method)(route.path, route.data)
+            elapsed = (time.perf_counter() - started) * 1000
+            if number >= options['warmup']:
+                timings.append(elapsed)
+        return timings
+
+    def get_client(self, route, clients, bench_user):
+        if route.client == 'fresh':
+            return Client()
+        if route.client == 'fresh_author':
+            client = Client()
+            client.force_login(bench_user)
+            return client
+        return clients[route.client]
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"маршрут":28} {"код":>4} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"запр.":>6} {"КиБ":>7}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:28} {result["status"]:>4} {result["p50"]:>8.2f} '
+                f'{result["p95"]:>8.2f} {result["p99"]:>8.2f} '
+                f'{result["queries"]:>6} {result["bytes"] / 1024:>7.1f}'
+            )
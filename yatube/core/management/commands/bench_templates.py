@@ -0,0 +1,108 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+from core.template_cache import is_cached
+from posts.forms import PostForm
+from posts.models import AuthorStats, Group, Post, User
+from posts.paginators import WindowPaginator
+from yatube.settings import PAGINATION_NUM
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время отрисовки шаблонов постов на реальной странице'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--pages', type=int, default=50,
+            help='Сколько страниц в паджинаторе ленты'
+        )
+
+    def build_posts(self, per_page, pages):
+        """Несохраненные посты: шаблоны не ходят за ними в базу."""
+        authors = []
+        for x in range(5):
+            author = User(
+                pk=x + 1, username=f'author{x}',
+                first_name='Автор', last_name=f'Номер {x}'
+            )
+            author.stats = AuthorStats(author=author, posts_count=pages)
+            authors.append(author)
+        groups = [
+            Group(pk=x + 1, title=f'Группа {x}', slug=f'group-{x}',
+                  description='Описание группы ' * 5)
+            for x in range(3)
+        ]
+        now = timezone.now()
+        return [
+            Post(
+                pk=x + 1,
+                text='Текст поста, достаточно длинный для ленты. ' * 8,
+                pub_date=now,
+                author=authors[x % len(authors)],
+                group=groups[x % len(groups)] if x % 4 else None,
+            )
+            for x in range(per_page * pages)
+        ], authors[0], groups[0]
+
+    def build_form(self, group):
+        form = PostForm()
+        form.fields['group'].choices = [('', '---------'), (group.pk, group)]
+        return form
+
+    def handle(self, *args, **options):
+        posts, author, group = self.build_posts(
+            PAGINATION_NUM, options['pages'])
+        # Тот же паджинатор, что в лентах: окно номеров вокруг страницы.
+        page_obj = WindowPaginator(posts, PAGINATION_NUM, len(posts)).get_page(
+            options['pages'] // 2)
+        feed = {
+            'page_obj': page_obj,
+            'feed': 'bench',
+            'feed_version': 0,
+            # Нулевой срок отключает кеш фрагментов: меряем отрисовку.
+            'fragment_timeout': 0,
+        }
+        cases = [
+            ('posts/index.html', '/', feed),
+            ('posts/group_list.html', '/group/group-0/',
+             dict(feed, group=group)),
+            ('posts/profile.html', '/profile/author0/',
+             dict(feed, author=author)),
+            ('posts/post_detail.html', '/posts/1',
+             {'post': posts[0]}),
+            ('posts/create_post.html', '/create/',
+             {'form': self.build_form(group), 'groups': []}),
+        ]
+        mode = 'кешированный' if is_cached() else 'без кеша'
+        self.stdout.write(f'Загрузчик шаблонов: {mode}')
+        factory = RequestFactory()
+        for name, path, context in cases:
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            request.resolver_match = resolve(path)
+            output = get_template(name).render(context, request)
+            if 'page_obj' in context:
+                # Ссылка с номером соседней страницы из окна паджинатора.
+                number = context['page_obj'].number + 1
+                if f'page={number}">{number}</a>' not in output:
+                    raise CommandError(
+                        f'{name}: в паджинаторе нет номеров страниц')
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                get_template(name).render(context, request)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{name:28} среднее {statistics.mean(timings):7.3f} мс  '
+                f'медиана {statistics.median(timings):7.3f} мс  '
+                f'мин {min(timings):7.3f} мс'
+            )
@@ -0,0 +1,80 @@
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slow_queries import normalize_sql
+
+SQL_WIDTH = 160
+SORT_KEYS = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}
+
+
+def aggregate(lines):
+    """Сводка записей лога по нормализованному SQL.
+
+    Строки, которые не разбираются как JSON, пропускаются: лог мог быть
+    обрезан ротацией посреди записи.
+    """
+    groups = {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        sql = normalize_sql(record['sql'])
+        group = groups.setdefault(sql, {
+            'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'views': Counter(), 'frames': Counter(),
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        group['views'][record.get('view')] += 1
+        stack = record.get('stack')
+        if stack:
+            group['frames'][stack[-1]] += 1
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = 'Сводит лог медленных запросов: самые дорогие запросы сверху'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'log', nargs='?',
+            help='Файл лога, по умолчанию SLOW_QUERY_LOG'
+        )
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+            help='Порядок: суммарное время, число или худшее время'
+        )
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        try:
+            with open(path, encoding='utf-8') as log:
+                groups = aggregate(log)
+        except FileNotFoundError:
+            raise CommandError(f'Нет лога медленных запросов: {path}')
+        key = SORT_KEYS[options['sort']]
+        groups.sort(key=lambda group: group[key], reverse=True)
+        for group in groups[:options['top']]:
+            self.stdout.write(
+                f'{group["count"]:>6} раз  {group["total_ms"]:>10.1f} мс  '
+                f'макс. {group["max_ms"]:.1f} мс  '
+                f'среднее {group["total_ms"] / group["count"]:.1f} мс'
+            )
+            self.stdout.write(f'  {group["sql"][:SQL_WIDTH]}')
+            views = ', '.join(
+                f'{view} ({count})'
+                for view, count in group['views'].most_common(3))
+            self.stdout.write(f'  view: {views}')
+            if group['frames']:
+                frame, _ = group['frames'].most_common(1)[0]
+                self.stdout.write(f'  откуда: {frame}')
+        self.stdout.write(
+            f'Всего разных запросов: {len(groups)}, '
+            f'записей: {sum(group["count"] for group in groups)}'
+        )
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Какие реплики обновить, по умолчанию все'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} нет в DATABASE_REPLICAS')
+            target = connections[alias]
+            if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+                raise CommandError(
+                    f'{alias}: копировать можно только SQLite в SQLite, '
+                    'остальные базы реплицируются своими средствами'
+                )
+            source.ensure_connection()
+            target.close()
+            target.ensure_connection()
+            source.connection.backup(target.connection)
+            self.stdout.write(f'{alias}: копия основной базы обновлена')
+        # Страницы, фрагменты и счетчики могли быть посчитаны по старой
+        # копии уже после того, как запись сбросила их версии.
+        cache.clear()
@@ -0,0 +1,345 @@
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+INITIAL_FILE_SIZE = 64 * 1024
+ARCHIVE_FILE = 'archive.db'
+MERGE_LOCK_FILE = 'merge.lock'
+HEADER = struct.Struct('<Q')
+KEY_LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _padded(length):
+    return length + (-length) % 8
+
+
+def read_entries(data):
+    """Пары (ключ, значение) из содержимого файла метрик.
+
+    Заголовок с занятым размером пишется после записи, поэтому
+    читатель видит только полностью записанные значения.
+    """
+    used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode('utf-8')
+        value_position = position + _padded(KEY_LENGTH.size + length)
+        yield key, VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + VALUE.size
+
+
+class ProcessValues:
+    """Значения метрик одного процесса в файле, отображенном в память.
+
+    Каждый процесс пишет только в свой файл, поэтому между процессами
+    не нужны блокировки, а /metrics складывает файлы всех процессов.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        if os.path.getsize(path) < INITIAL_FILE_SIZE:
+            self.file.truncate(INITIAL_FILE_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        if HEADER.unpack_from(self.map, 0)[0] == 0:
+            HEADER.pack_into(self.map, 0, HEADER.size)
+        self.positions = {
+            key: position for key, _, position in read_entries(self.map)}
+
+    def add(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self.append(key)
+            value = VALUE.unpack_from(self.map, position)[0]
+            VALUE.pack_into(self.map, position, value + amount)
+
+    def append(self, key):
+        encoded = key.encode('utf-8')
+        size = _padded(KEY_LENGTH.size + len(encoded)) + VALUE.size
+        used = HEADER.unpack_from(self.map, 0)[0]
+        if used + size > len(self.map):
+            capacity = len(self.map)
+            while used + size > capacity:
+                capacity *= 2
+            self.map.close()
+            self.file.truncate(capacity)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        KEY_LENGTH.pack_into(self.map, used, len(encoded))
+        self.map[used + KEY_LENGTH.size:
+                 used + KEY_LENGTH.size + len(encoded)] = encoded
+        position = used + size - VALUE.size
+        VALUE.pack_into(self.map, position, 0.0)
+        HEADER.pack_into(self.map, 0, used + size)
+        self.positions[key] = position
+        return position
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def reset(self, names):
+        """Обнуляет значения метрик names, например датчики прошлого
+        процесса с тем же pid."""
+        with self.lock:
+            for key, position in self.positions.items():
+                if json.loads(key)[0] in names:
+                    VALUE.pack_into(self.map, position, 0.0)
+
+
+_values = None
+_values_lock = threading.Lock()
+
+
+def process_values():
+    """Файл значений текущего процесса, после fork открывается новый."""
+    global _values
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+    if _values is None or _values.path != path:
+        with _values_lock:
+            if _values is None or _values.path != path:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                values = ProcessValues(path)
+                values.reset({
+                    metric.name for metric in REGISTRY
+                    if metric.kind == 'gauge'
+                })
+                _values = values
+    return _values
+
+
+def sample_key(name, labels):
+    return json.dumps([name, labels], sort_keys=True, ensure_ascii=False)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def label_values(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name}: метки {self.labels}')
+        return {name: str(value) for name, value in labels.items()}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        process_values().add(
+            sample_key(self.name, self.label_values(labels)), amount)
+
+
+class Gauge(Metric):
+    """Текущее значение; складываются только живые процессы."""
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        process_values().add(
+            sample_key(self.name, self.label_values(labels)), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        labels = self.label_values(labels)
+        # В файл пишется попадание в одну корзину, накопленные значения
+        # le считаются при выводе.
+        index = bisect.bisect_left(self.buckets, value)
+        bound = self.buckets[index] if index < len(self.buckets) else '+Inf'
+        values = process_values()
+        values.add(sample_key(
+            f'{self.name}_bucket', dict(labels, le=str(bound))), 1)
+        values.add(sample_key(f'{self.name}_sum', labels), value)
+        values.add(sample_key(f'{self.name}_count', labels), 1)
+
+
+REGISTRY = []
+
+requests_total = Counter(
+    'yatube_http_requests_total', 'Запросы по имени URL и статусу',
+    ('view', 'status'))
+request_duration = Histogram(
+    'yatube_http_request_duration_seconds', 'Время ответа в секундах',
+    ('view', 'status'), LATENCY_BUCKETS)
+request_queries = Histogram(
+    'yatube_http_request_db_queries', 'Запросов к базе на HTTP-запрос',
+    ('view',), QUERY_BUCKETS)
+requests_in_flight = Gauge(
+    'yatube_http_requests_in_flight', 'Запросы, которые сейчас выполняются')
+cache_requests = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кешу страниц, счетчиков и объектов',
+    ('cache', 'result'))
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _gauge_names():
+    return {metric.name for metric in REGISTRY if metric.kind == 'gauge'}
+
+
+def _read_file(path):
+    """Содержимое файла метрик; None, если файла уже нет или он пуст."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    return data if len(data) >= HEADER.size else None
+
+
+def mark_process_dead(pid):
+    """Переносит счетчики и гистограммы завершившегося процесса в общий
+    архив и удаляет его файл, датчики процесса отбрасываются.
+
+    Так каталог не растет с каждым перезапуском воркеров, а новый
+    процесс с тем же pid начинает с пустого файла.
+    """
+    path = os.path.join(settings.METRICS_DIR, f'{pid}.db')
+    gauges = _gauge_names()
+    lock_path = os.path.join(settings.METRICS_DIR, MERGE_LOCK_FILE)
+    with open(lock_path, 'a') as lock:
+        # Без блокировки два сборщика перенесли бы один файл дважды.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        data = _read_file(path)
+        if data is not None:
+            archive = ProcessValues(
+                os.path.join(settings.METRICS_DIR, ARCHIVE_FILE))
+            try:
+                for key, value, _ in read_entries(data):
+                    if json.loads(key)[0] not in gauges:
+                        archive.add(key, value)
+            finally:
+                archive.close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def collect():
+    """Сумма значений по архиву и файлам живых процессов:
+    ключ -> значение."""
+    totals = {}
+    if not os.path.isdir(settings.METRICS_DIR):
+        return totals
+    for filename in os.listdir(settings.METRICS_DIR):
+        pid, extension = os.path.splitext(filename)
+        if extension == '.db' and pid.isdigit() and not is_alive(int(pid)):
+            mark_process_dead(int(pid))
+    gauges = _gauge_names()
+    for filename in os.listdir(settings.METRICS_DIR):
+        pid, extension = os.path.splitext(filename)
+        if extension != '.db':
+            continue
+        if not pid.isdigit() and filename != ARCHIVE_FILE:
+            continue
+        data = _read_file(os.path.join(settings.METRICS_DIR, filename))
+        if data is None:
+            continue
+        # Процесс мог завершиться уже после переноса файлов.
+        alive = not pid.isdigit() or is_alive(int(pid))
+        for key, value, _ in read_entries(data):
+            if not alive and json.loads(key)[0] in gauges:
+                continue
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _format(name, labels, value):
+    if labels:
+        pairs = ','.join(
+            f'{label}="{_escape(labels[label])}"' for label in labels)
+        name = f'{name}{{{pairs}}}'
+    return f'{name} {float(value)!r}'
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    samples = {}
+    for key, value in collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((labels, value))
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if metric.kind != 'histogram':
+            for labels, value in sorted(
+                    samples.get(metric.name, []), key=_label_order):
+                lines.append(_format(metric.name, labels, value))
+            continue
+        lines.extend(_render_histogram(metric, samples))
+    return '\n'.join(lines) + '\n'
+
+
+def _label_order(sample):
+    return sorted(sample[0].items())
+
+
+def _render_histogram(metric, samples):
+    buckets = {}
+    for labels, value in samples.get(f'{metric.name}_bucket', []):
+        bound = labels.pop('le')
+        series = buckets.setdefault(json.dumps(labels, sort_keys=True), {})
+        series[bound] = value
+    sums = {json.dumps(labels, sort_keys=True): value
+            for labels, value in samples.get(f'{metric.name}_sum', [])}
+    counts = {json.dumps(labels, sort_keys=True): value
+              for labels, value in samples.get(f'{metric.name}_count', [])}
+    lines = []
+    bounds = [str(bound) for bound in metric.buckets] + ['+Inf']
+    for series_key in sorted(buckets):
+        labels = json.loads(series_key)
+        cumulative = 0
+        for bound in bounds:
+            cumulative += buckets[series_key].get(bound, 0)
+            lines.append(_format(
+                f'{metric.name}_bucket', dict(labels, le=bound), cumulative))
+        lines.append(_format(
+            f'{metric.name}_sum', labels, sums.get(series_key, 0)))
+        lines.append(_format(
+            f'{metric.name}_count', labels, counts.get(series_key, 0)))
+    return lines
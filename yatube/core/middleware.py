@@ -0,0 +1,181 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, slow_queries
+from .profiling import Profile
+from .storage import COMPRESSIBLE_EXTENSIONS
+
+profiling_logger = logging.getLogger('yatube.profiling')
+
+# Файл с хешем в имени не меняется, поэтому его можно кешировать навсегда.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHORT_CACHE_CONTROL = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFilesMiddleware:
+    """Раздает собранную статику из STATIC_ROOT без похода во view.
+
+    Выбирает заранее сжатую копию по Accept-Encoding и отдает файлы из
+    манифеста с заголовками вечного кеширования. При DEBUG статику
+    раздает runserver, и middleware ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(
+            not settings.DEBUG and settings.STATIC_ROOT
+            and os.path.isdir(settings.STATIC_ROOT)
+        )
+        self.hashed_names = None
+
+    def __call__(self, request):
+        if self.enabled and request.path.startswith(settings.STATIC_URL):
+            response = self.serve(
+                request, request.path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def is_hashed(self, name):
+        if self.hashed_names is None:
+            self.hashed_names = set(
+                getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return name in self.hashed_names
+
+    def serve(self, request, name):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(path)
+        encoding = None
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            accepted = {
+                part.split(';')[0].strip() for part in
+                request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+            }
+            for candidate, extension in ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + extension):
+                    path += extension
+                    encoding = candidate
+                    break
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream'
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if self.is_hashed(name)
+            else SHORT_CACHE_CONTROL
+        )
+        return response
+
+
+class MetricsMiddleware:
+    """Считает запросы, их время и число запросов к базе для /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        metrics.requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            metrics.requests_in_flight.dec()
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        status = response.status_code
+        metrics.requests_total.inc(view=view, status=status)
+        metrics.request_duration.observe(
+            time.perf_counter() - started, view=view, status=status)
+        metrics.request_queries.observe(queries, view=view)
+        return response
+
+
+class ProfilingMiddleware:
+    """Замеряет SQL, шаблоны и Python в доле запросов.
+
+    Попавший в выборку запрос получает заголовок Server-Timing и строку
+    JSON в логгере yatube.profiling. Остальные запросы платят только за
+    один вызов random(). Доля задается PROFILING_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with Profile() as profile, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(profile.execute))
+            response = self.get_response(request)
+        timings = profile.timings(time.perf_counter() - started)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings["db"]:.1f};desc="{profile.queries} SQL"',
+            f'tpl;dur={timings["tpl"]:.1f}',
+            f'py;dur={timings["py"]:.1f}',
+            f'total;dur={timings["total"]:.1f};desc="{view_name}"',
+        ])
+        profiling_logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.queries,
+            **{f'{name}_ms': round(value, 2)
+               for name, value in timings.items()},
+        }))
+        return response
+
+
+class SlowQueryMiddleware:
+    """Передает записи медленных запросов view текущего запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_queries.request_context(request):
+            return self.get_response(request)
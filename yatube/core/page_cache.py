@@ -0,0 +1,115 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from . import metrics
+from .db import primary_pin, reading_replica
+
+HEADER_MARKER = '<!-- yatube:header -->'
+VERSION_KEY = 'page:version'
+BUMPED_KEY = 'page:bumped'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Делает недействительными все закешированные страницы."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+    cache.set(
+        BUMPED_KEY, time.time(), settings.DATABASE_PRIMARY_PIN_SECONDS)
+
+
+def may_store():
+    """Можно ли положить в кеш страницу, нарисованную в этом запросе.
+
+    Реплика может еще не догнать запись, из-за которой сменилась версия,
+    и страница с реплики легла бы под новую версию устаревшей. Поэтому
+    DATABASE_PRIMARY_PIN_SECONDS после смены версии страницы с реплик в
+    кеш не кладутся.
+    """
+    if not reading_replica():
+        return True
+    bumped = cache.get(BUMPED_KEY)
+    return (bumped is None
+            or time.time() - bumped >= settings.DATABASE_PRIMARY_PIN_SECONDS)
+
+
+def lag_window():
+    """Метка для ключей фрагментов, нарисованных без права may_store().
+
+    Фрагмент с отстающей реплики не должен лечь под общий ключ новой
+    версии. Под меткой своего окна DATABASE_PRIMARY_PIN_SECONDS он
+    перестает читаться, когда окно проходит. Пустая строка, если
+    фрагмент можно кешировать как обычно.
+    """
+    if may_store():
+        return ''
+    window = int(time.time() // settings.DATABASE_PRIMARY_PIN_SECONDS)
+    return f'lag{window}'
+
+
+def page_key(request):
+    return f'page:{get_version()}:{request.get_full_path()}'
+
+
+def render_header(request, content):
+    """Вставляет в тело страницы шапку, отрисованную для пользователя."""
+    header = render_to_string('includes/header.html', request=request)
+    return content.replace(HEADER_MARKER, header, 1)
+
+
+def cache_page_body(view=None, anonymous_only=False):
+    """Кеширует страницу целиком, кроме персональной шапки.
+
+    Страница рисуется с меткой вместо includes/header.html и в таком
+    виде кладется в кеш, а шапка рисуется на каждый запрос отдельно.
+    Поэтому одно закешированное тело подходит и анонимам, и вошедшим
+    пользователям. Если в теле есть другие персональные части,
+    anonymous_only=True оставляет кеш только анонимам.
+    """
+    if view is None:
+        return lambda view: cache_page_body(view, anonymous_only)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or primary_pin(request) or (
+                anonymous_only and request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        cached = cache.get(key)
+        metrics.cache_requests.inc(
+            cache='page', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(
+                render_header(request, content), content_type=content_type)
+        request.defer_header = True
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        if response.streaming:
+            return response
+        content = response.content.decode(response.charset)
+        if (response.status_code == 200 and HEADER_MARKER in content
+                and not response.cookies and may_store()):
+            cache.set(
+                key, (content, response['Content-Type']),
+                settings.PAGE_CACHE_TIMEOUT
+            )
+        response.content = render_header(request, content)
+        return response
+
+    return wrapper
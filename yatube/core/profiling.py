@@ -0,0 +1,80 @@
+import time
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+_current = ContextVar('profile', default=None)
+
+
+class Profile:
+    """Время запроса, разложенное на SQL, шаблоны и остальной Python."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.sql_in_template = 0.0
+        self.template = 0.0
+        self.template_depth = 0
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: считает запросы и их время."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql += elapsed
+            if self.template_depth:
+                self.sql_in_template += elapsed
+
+    def timings(self, total):
+        """Доли запроса в миллисекундах.
+
+        Ленивые запросы, выполненные во время отрисовки, входят и в db, и
+        в tpl, поэтому py считается без этого пересечения.
+        """
+        python = total - self.template - (self.sql - self.sql_in_template)
+        return {
+            'db': self.sql * 1000,
+            'tpl': self.template * 1000,
+            'py': max(python, 0) * 1000,
+            'total': total * 1000,
+        }
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template += time.perf_counter() - started
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Движок Django, который замеряет отрисовку в профилируемых запросах."""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
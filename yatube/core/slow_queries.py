@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+slow_query_logger = logging.getLogger('yatube.db.slow')
+
+# Сколько кадров проекта и символов параметра попадает в запись лога.
+STACK_DEPTH = 8
+PARAM_LENGTH = 200
+TEMPLATE_NODE_FILE = os.path.join('django', 'template', 'base.py')
+
+_current_request = ContextVar('slow_query_request', default=None)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+VALUES_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Текст запроса без значений: одинаковые запросы с разными
+    параметрами и разной длиной IN (...) сводятся к одной строке."""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = VALUES_LIST.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def project_stack(frame):
+    """Кадры проекта от внешнего к внутреннему: файлы из BASE_DIR и
+    строки шаблонов, на отрисовке которых выполнился запрос."""
+    root = os.path.join(settings.BASE_DIR, '')
+    stack = []
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.endswith(TEMPLATE_NODE_FILE):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if frame.f_code.co_name == 'render_annotated' and origin:
+                name = origin.template_name or origin.name
+                line = f'{name}:{token.lineno}'
+                if not stack or stack[-1] != line:
+                    stack.append(line)
+        elif (filename.startswith(root) and filename != __file__
+                and 'site-packages' not in filename):
+            stack.append(
+                f'{os.path.relpath(filename, root)}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return stack[:STACK_DEPTH][::-1]
+
+
+def _trimmed_params(params, many):
+    if many:
+        return f'<{len(params)} наборов>'
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        params = params.values()
+    return [repr(value)[:PARAM_LENGTH] for value in params]
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Обертка connection.execute_wrapper: пишет в лог yatube.db.slow
+    запросы дольше SLOW_QUERY_THRESHOLD_MS."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold is not None and duration >= threshold:
+            request = _current_request.get()
+            match = request and request.resolver_match
+            slow_query_logger.warning(json.dumps({
+                'sql': sql,
+                'params': _trimmed_params(params, many),
+                'duration_ms': round(duration, 3),
+                'database': context['connection'].alias,
+                'view': match.view_name if match else None,
+                'path': request.path if request else None,
+                'stack': project_stack(sys._getframe(1)),
+            }, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def request_context(request):
+    """Внутри блока медленные запросы записываются с view запроса."""
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def install(connection):
+    """Подключает запись медленных запросов к соединению один раз.
+
+    Обертка встает в начало списка: connection.execute_wrapper() снимает
+    последнюю обертку, и соединение может открыться внутри такого блока.
+    """
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_query)
@@ -0,0 +1,70 @@
+import gzip
+import os
+import warnings
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.xml', '.map',
+)
+
+
+def compress_variants(content):
+    """Сжатые версии файла: расширение -> байты.
+
+    Версия попадает в результат, только если она меньше исходника.
+    """
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {
+        extension: data for extension, data in variants.items()
+        if len(data) < len(content)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хешами в именах и заранее сжатыми копиями.
+
+    collectstatic пишет рядом с каждым текстовым файлом .gz и .br, чтобы
+    сервер не сжимал их на лету. Без пакета brotli (он есть в
+    requirements.txt) копии .br не пишутся, о чем выводится
+    предупреждение.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        if brotli is None:
+            warnings.warn(
+                'Пакет brotli не установлен: копии статики .br не созданы, '
+                'только .gz', RuntimeWarning
+            )
+        names = set(self.hashed_files.values()) | set(paths)
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            if not self.exists(name):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            for extension, data in compress_variants(content).items():
+                compressed_name = name + extension
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(data))
+
+    def stored_name(self, name):
+        # Пока collectstatic не запускался, манифеста нет: отдаем имя как
+        # есть, а файлы раздает staticfiles из STATICFILES_DIRS.
+        if not self.hashed_files and not os.path.exists(
+                self.path(self.manifest_name)):
+            return name
+        return super().stored_name(name)
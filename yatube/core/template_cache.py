@@ -0,0 +1,46 @@
+import os
+
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.template.loaders.cached import Loader as CachedLoader
+
+WARM_PREFIXES = ('base.html', 'posts/', 'includes/')
+
+
+def template_names(prefixes=WARM_PREFIXES):
+    """Имена шаблонов из каталогов движка, начинающиеся с prefixes."""
+    directories = list(engines['django'].engine.dirs)
+    directories += get_app_template_dirs('templates')
+    names = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.endswith('.html'):
+                    continue
+                name = os.path.relpath(
+                    os.path.join(root, filename), directory
+                ).replace(os.sep, '/')
+                if name.startswith(prefixes):
+                    names.add(name)
+    return sorted(names)
+
+
+def is_cached():
+    engine = engines['django'].engine
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def warm_templates(prefixes=WARM_PREFIXES):
+    """Заранее разбирает шаблоны, чтобы первый запрос не платил за это.
+
+    Работает только с кешированным загрузчиком, иначе скомпилированные
+    шаблоны некуда сохранить. Возвращает имена разобранных шаблонов.
+    """
+    if not is_cached():
+        return []
+    engine = engines['django']
+    names = template_names(prefixes)
+    for name in names:
+        engine.get_template(name)
+    return names
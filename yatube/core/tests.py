@@ -0,0 +1,590 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Group, Post, User
+
+from . import metrics
+from .apps import check_shared_cache
+from .db import apply_sqlite_pragmas
+from .management.commands.bench_http import BENCH_USERNAME, compare
+from .middleware import IMMUTABLE_CACHE_CONTROL, StaticFilesMiddleware
+from .slow_queries import normalize_sql
+from .template_cache import is_cached, warm_templates
+
+STATIC_ROOT = tempfile.mkdtemp()
+PLAIN_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [settings.TEMPLATES_DIR],
+    'OPTIONS': {
+        'context_processors': (
+            settings.TEMPLATES[0]['OPTIONS']['context_processors']),
+        'loaders': [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+    },
+}]
+CACHED_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [settings.TEMPLATES_DIR],
+    'OPTIONS': {
+        'context_processors': (
+            settings.TEMPLATES[0]['OPTIONS']['context_processors']),
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+
+@override_settings(STATIC_ROOT=STATIC_ROOT, DEBUG=False)
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = StaticFilesMiddleware(
+            lambda request: HttpResponse('view'))
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        """Статика собирается с хешем в имени и сжатыми копиями"""
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        self.assertNotEqual(name, 'css/bootstrap.min.css')
+        with staticfiles_storage.open(name) as original:
+            content = original.read()
+        with staticfiles_storage.open(name + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), content)
+        self.assertFalse(staticfiles_storage.exists(
+            staticfiles_storage.stored_name('img/logo.png') + '.gz'))
+
+    def test_collectstatic_warns_without_brotli(self):
+        """Без brotli collectstatic пишет только .gz и предупреждает"""
+        with mock.patch('core.storage.brotli', None):
+            with self.assertWarnsRegex(RuntimeWarning, 'brotli'):
+                call_command(
+                    'collectstatic', interactive=False, stdout=StringIO())
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        self.assertTrue(staticfiles_storage.exists(name + '.gz'))
+
+    def test_hashed_file_served_compressed_forever(self):
+        """Файл с хешем отдается сжатым и с вечным кешированием"""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        response = self.middleware(
+            self.factory.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate'))
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_unhashed_and_missing_files(self):
+        """Файл без хеша кешируется ненадолго, неизвестный идет во view"""
+        response = self.middleware(
+            self.factory.get('/static/css/bootstrap.min.css'))
+        self.assertNotEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        for path in ['/static/missing.css', '/static/../manage.py']:
+            with self.subTest(path=path):
+                response = self.middleware(self.factory.get(path))
+                self.assertEqual(response.content, b'view')
+
+    def test_base_template_links_static_favicons(self):
+        """Иконки сайта подключаются через static с хешем"""
+        response = self.client.get('/about/tech/')
+        self.assertContains(
+            response, staticfiles_storage.url('img/fav/favicon.ico'))
+        self.assertNotContains(response, 'href="img/fav/')
+
+
+class TemplateCacheTest(TestCase):
+    @override_settings(TEMPLATES=PLAIN_TEMPLATES)
+    def test_warm_needs_cached_loader(self):
+        """Без кешированного загрузчика шаблоны заранее не разбираются"""
+        self.assertFalse(is_cached())
+        self.assertEqual(warm_templates(), [])
+
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_warm_parses_post_templates(self):
+        """Прогрев разбирает шаблоны постов и кладет их в кеш загрузчика"""
+        names = warm_templates()
+        self.assertIn('base.html', names)
+        self.assertIn('posts/index.html', names)
+        self.assertIn('includes/header.html', names)
+        self.assertNotIn('about/author.html', names)
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_cached_pages_render(self):
+        """Страницы отрисовываются и с кешированным загрузчиком"""
+        cache.clear()
+        for url in ('/', '/search/?q=test', '/about/author/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_bench_templates_command(self):
+        """Замер отрисовки проходит по всем шаблонам постов, ленты
+        рисуются с номерами страниц"""
+        out = StringIO()
+        call_command('bench_templates', iterations=1, stdout=out)
+        for name in ('posts/index.html', 'posts/post_detail.html',
+                     'posts/create_post.html'):
+            self.assertIn(name, out.getvalue())
+
+
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 0,
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+
+class SqliteProfileTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def open(self, name):
+        params = dict(connection.settings_dict, NAME=os.path.join(
+            self.directory, name), OPTIONS={'timeout': 0})
+        wrapper = DatabaseWrapper(params, alias=name)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def connect(self, name):
+        wrapper = self.open(name)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def write_during_read(self, name):
+        """Пишет в базу, пока другое соединение держит открытое чтение.
+
+        Возвращает режим журнала пишущего соединения и ошибку записи
+        (None, если запись прошла).
+        """
+        setup = self.connect(name)
+        with setup.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT)')
+        reader = self.connect(name)
+        with reader.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT count(*) FROM item')
+            cursor.fetchone()
+        writer = self.connect(name)
+        with writer.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            try:
+                cursor.execute(
+                    'INSERT INTO item (text) VALUES (%s)', ['Тестовый текст'])
+            except OperationalError as error:
+                return journal_mode, error
+        return journal_mode, None
+
+    def test_new_connection_gets_pragmas(self):
+        """Каждое новое соединение с SQLite получает прагмы из настроек"""
+        wrapper = self.connect('pragmas.sqlite3')
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        wrapper.close()
+        self.assertGreater(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+    def test_rejects_unsafe_pragma_value(self):
+        """Значение прагмы не может дописать в запрос лишний SQL"""
+        wrapper = self.connect('unsafe.sqlite3')
+        self.addCleanup(wrapper.close)
+        with self.assertRaises(ValueError):
+            apply_sqlite_pragmas(
+                wrapper, {'cache_size': '1; DROP TABLE item'})
+
+    def test_concurrent_reads_and_writes(self):
+        """Открытое чтение не блокирует запись, как при настройках SQLite
+        по умолчанию"""
+        with override_settings(SQLITE_PRAGMAS=DEFAULT_PRAGMAS):
+            journal_mode, error = self.write_during_read('default.sqlite3')
+        self.assertEqual(journal_mode, 'delete')
+        self.assertIn('database is locked', str(error))
+        journal_mode, error = self.write_during_read('tuned.sqlite3')
+        self.assertEqual(journal_mode, 'wal')
+        self.assertIsNone(error)
+
+    def test_mixed_load_from_threads(self):
+        """Параллельные чтения и записи из разных потоков проходят без
+        ошибок блокировки"""
+        name = 'mixed.sqlite3'
+        setup = self.connect(name)
+        with setup.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT)')
+        errors = []
+
+        def work(write):
+            # Соединение Django принадлежит потоку, который его открыл.
+            wrapper = self.open(name)
+            try:
+                for x in range(50):
+                    with wrapper.cursor() as cursor:
+                        if write:
+                            cursor.execute(
+                                'INSERT INTO item (text) VALUES (%s)',
+                                [f'Запись {x}'])
+                        else:
+                            cursor.execute('SELECT count(*) FROM item')
+                            cursor.fetchone()
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                wrapper.close()
+
+        threads = [
+            threading.Thread(target=work, args=(x % 2 == 0,))
+            for x in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with setup.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], 4 * 50)
+
+
+class BenchHttpTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group)
+        self.path = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def test_bench_reports_every_route(self):
+        """Замер сохраняет перцентили, запросы и размер по всем маршрутам
+        и откатывает свои записи"""
+        call_command(
+            'bench_http', iterations=3, warmup=0, output=self.path,
+            stdout=StringIO()
+        )
+        with open(self.path, encoding='utf-8') as report:
+            routes = json.load(report)['routes']
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:post_create',
+                     'posts:post_edit', 'about:author', 'about:tech',
+                     'users:login', 'users:signup', 'users:logout'):
+            with self.subTest(name=name):
+                self.assertEqual(routes[name]['status'], 200)
+                self.assertLessEqual(
+                    routes[name]['p50'], routes[name]['p99'])
+                self.assertGreater(routes[name]['bytes'], 0)
+        self.assertEqual(routes['posts:post_create:post']['status'], 302)
+        self.assertEqual(routes['users:login:post']['status'], 302)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(User.objects.filter(username=BENCH_USERNAME).exists())
+
+    def test_bench_keeps_site_cache(self):
+        """Замер идет через кеш сайта в своем пространстве ключей, не
+        трогает чужие ключи и убирает свои"""
+        cache.set('bench-test-key', 'value')
+        call_command(
+            'bench_http', iterations=1, warmup=0, cold=True,
+            routes=['posts:index'], stdout=StringIO()
+        )
+        self.assertEqual(cache.get('bench-test-key'), 'value')
+        self.assertFalse([
+            key for key in caches['default']._cache if 'bench_http' in key])
+
+    def test_compare_flags_regressions(self):
+        """Сравнение с базовым замером находит рост задержки и запросов,
+        но не шум"""
+        route = {'p50': 10.0, 'p95': 20.0, 'p99': 30.0, 'mean': 12.0,
+                 'queries': 2, 'bytes': 1000, 'status': 200}
+        baseline = {'routes': {'index': route, 'about': dict(
+            route, p50=0.5, p95=0.6)}}
+        current = {'routes': {
+            'index': dict(route, p50=13.0, queries=3),
+            'about': dict(route, p50=0.9, p95=0.9),
+            'new': route,
+        }}
+        regressions = compare(current, baseline, 0.2, 0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('index: p50'))
+        self.assertIn('запросов 2 -> 3', regressions[1])
+        self.assertEqual(compare(baseline, baseline, 0.2, 0.5), [])
+        with open(self.path, 'w', encoding='utf-8') as report:
+            json.dump({'routes': {'posts:index': dict(
+                route, p50=0.001, p95=0.001, queries=0)}}, report)
+        with self.assertRaises(CommandError):
+            call_command(
+                'bench_http', iterations=2, routes=['posts:index'],
+                compare=self.path, stdout=StringIO()
+            )
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.post = Post.objects.create(text='Тестовый пост', author=self.user)
+
+    def test_sampled_request_gets_server_timing(self):
+        """Профилируемый запрос получает Server-Timing и строку в логе"""
+        url = f'/posts/{self.post.pk}'
+        with self.assertLogs('yatube.profiling', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'py;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIn('desc="posts:post_detail"', header)
+        self.assertIn(f'desc="{len(queries)} SQL"', header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], len(queries))
+        self.assertGreater(record['tpl_ms'], 0)
+        self.assertGreaterEqual(
+            record['total_ms'], record['tpl_ms'] + record['py_ms'])
+
+    def test_unsampled_request_untouched(self):
+        """При нулевой доле middleware отключается"""
+        with override_settings(PROFILING_SAMPLE_RATE=0):
+            response = Client().get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(METRICS_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_metrics_count_requests_and_cache(self):
+        """/metrics отдает счетчики запросов, гистограммы и кеш"""
+        self.client.get('/')
+        self.client.get('/')
+        self.client.get('/about/author/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        for line in (
+            'yatube_http_requests_total{status="200",view="posts:index"} 2.0',
+            'yatube_http_request_duration_seconds_bucket'
+            '{status="200",view="posts:index",le="+Inf"} 2.0',
+            'yatube_http_request_duration_seconds_count'
+            '{status="200",view="posts:index"} 2.0',
+            'yatube_http_request_db_queries_count{view="about:author"} 1.0',
+            'yatube_cache_requests_total{cache="page",result="hit"} 1.0',
+            'yatube_cache_requests_total{cache="page",result="miss"} 2.0',
+            'yatube_http_requests_in_flight 1.0',
+            '# TYPE yatube_http_request_duration_seconds histogram',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, body)
+
+    def test_metrics_aggregate_processes(self):
+        """Счетчики складываются по процессам, датчики умерших
+        процессов не учитываются"""
+        metrics.requests_total.inc(view='posts:index', status=200)
+        pid = os.fork()
+        if pid == 0:
+            metrics.requests_total.inc(2, view='posts:index', status=200)
+            metrics.requests_in_flight.inc()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        body = metrics.render()
+        self.assertIn(
+            'yatube_http_requests_total{status="200",view="posts:index"} 3.0',
+            body)
+        self.assertNotIn('yatube_http_requests_in_flight 1.0', body)
+
+    def test_dead_process_merged_into_archive(self):
+        """Файл завершившегося процесса переносится в архив один раз"""
+        pid = os.fork()
+        if pid == 0:
+            metrics.requests_total.inc(2, view='posts:index', status=200)
+            metrics.requests_in_flight.inc()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        key = metrics.sample_key(
+            'yatube_http_requests_total',
+            {'status': '200', 'view': 'posts:index'})
+        for _ in range(2):
+            totals = metrics.collect()
+            self.assertEqual(totals[key], 2)
+            self.assertNotIn(
+                metrics.sample_key('yatube_http_requests_in_flight', {}),
+                totals)
+        files = os.listdir(settings.METRICS_DIR)
+        self.assertNotIn(f'{pid}.db', files)
+        self.assertIn(metrics.ARCHIVE_FILE, files)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'], METRICS_TOKEN='')
+    def test_metrics_closed_to_other_addresses(self):
+        """/metrics закрыт для адресов не из списка"""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='secret')
+    def test_metrics_open_with_token(self):
+        """/metrics доступен с токеном из настроек"""
+        for header, status in (('Bearer secret', 200), ('Bearer other', 403),
+                               ('Bearer сек', 403)):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/metrics', HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, status)
+
+    def test_values_file_grows(self):
+        """Файл процесса расширяется, когда в нем кончается место"""
+        for number in range(3000):
+            metrics.requests_total.inc(view=f'view{number}', status=200)
+        totals = metrics.collect()
+        self.assertEqual(len(totals), 3000)
+        self.assertEqual(sum(totals.values()), 3000)
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='TestUser')
+        self.post = Post.objects.create(text='Тестовый пост', author=user)
+
+    def test_slow_query_logged_with_view_and_stack(self):
+        """Запрос дольше порога пишется с SQL, view и кадрами проекта"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('yatube.db.slow', 'WARNING') as logs:
+            self.client.get(f'/posts/{self.post.pk}')
+        records = [json.loads(record.getMessage())
+                   for record in logs.records]
+        record = next(
+            record for record in records if 'posts_post' in record['sql'])
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertEqual(record['path'], f'/posts/{self.post.pk}')
+        self.assertIsInstance(record['params'], list)
+        self.assertGreaterEqual(record['duration_ms'], 0)
+        self.assertTrue(any(
+            frame.startswith('posts/views.py:') for frame in record['stack']))
+
+    def test_template_query_points_to_template_line(self):
+        """Ленивый запрос из шаблона указывает на строку шаблона"""
+        template = engines['django'].from_string(
+            '<ul>\n{% for post in posts %}{{ post.text }}{% endfor %}</ul>')
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('yatube.db.slow', 'WARNING') as logs:
+            template.render({'posts': Post.objects.all()})
+        stack = json.loads(logs.records[0].getMessage())['stack']
+        self.assertEqual(stack[-1], '<unknown source>:2')
+        self.assertTrue(any(
+            frame.startswith('core/tests.py:') for frame in stack))
+
+    def test_fast_query_not_logged(self):
+        """Запросы быстрее порога в лог не попадают"""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=10 ** 6), \
+                self.assertRaises(AssertionError), \
+                self.assertLogs('yatube.db.slow', 'WARNING'):
+            self.client.get(f'/posts/{self.post.pk}')
+
+    def test_normalize_sql(self):
+        """Значения и длина IN (...) не различают запросы"""
+        self.assertEqual(
+            normalize_sql(
+                "SELECT * FROM t WHERE id IN (%s, %s, %s) AND s = 'a''b'"),
+            normalize_sql(
+                "SELECT *\n FROM t WHERE id IN (%s, %s) AND s = 'c'"),
+        )
+        self.assertEqual(
+            normalize_sql('SELECT "t1"."id" FROM "t1" LIMIT 21'),
+            'SELECT "t1"."id" FROM "t1" LIMIT ?',
+        )
+
+    def test_command_aggregates_log(self):
+        """slow_queries сводит записи по нормализованному SQL"""
+        path = os.path.join(tempfile.mkdtemp(), 'slow.log')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        lines = [
+            {'sql': 'SELECT 1 FROM t WHERE id = %s', 'duration_ms': 300,
+             'view': 'posts:index', 'stack': ['posts/views.py:10 in index']},
+            {'sql': 'SELECT 1 FROM t WHERE id = %s', 'duration_ms': 500,
+             'view': 'posts:index', 'stack': ['posts/views.py:10 in index']},
+            {'sql': 'SELECT 2 FROM u', 'duration_ms': 700, 'view': None,
+             'stack': []},
+        ]
+        with open(path, 'w', encoding='utf-8') as log:
+            for line in lines:
+                log.write(json.dumps(line) + '\n')
+            log.write('{"обрезанная строка\n')
+        output = StringIO()
+        call_command('slow_queries', path, '--sort', 'total', stdout=output)
+        text = output.getvalue()
+        self.assertLess(
+            text.index('SELECT ? FROM t WHERE id = ?'),
+            text.index('SELECT ? FROM u'))
+        self.assertIn('2 раз', text)
+        self.assertIn('800.0 мс', text)
+        self.assertIn('posts/views.py:10 in index', text)
+        self.assertIn('записей: 3', text)
+        with self.assertRaises(CommandError):
+            call_command('slow_queries', path + '.missing')
+
+
+class SharedCacheTest(SimpleTestCase):
+    def test_process_local_cache_rejected_without_debug(self):
+        """Без DEBUG сервер не запускается с кешем в памяти процесса"""
+        locmem = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        filebased = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/yatube-cache'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache()
+        with override_settings(DEBUG=True, CACHES=locmem):
+            check_shared_cache()
+        with override_settings(DEBUG=False, CACHES=filebased):
+            check_shared_cache()
@@ -0,0 +1,27 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from .metrics import render
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_allowed(request):
+    """Пускает адреса из METRICS_ALLOWED_IPS и запросы с METRICS_TOKEN."""
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    if not settings.METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(),
+        f'Bearer {settings.METRICS_TOKEN}'.encode())
+
+
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,14 +1,28 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from . import search
+from .models import Follow, Group, Post
+from .paginators import EstimatedCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        if not search.to_match_query(search_term):
+            return queryset.none(), False
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -16,5 +30,13 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
 
 
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,136 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics, page_cache
+
+INDEX_FEED = 'index'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def post_feeds(author_id, group_id):
+    """Ленты, в которых показывается пост с такими автором и группой."""
+    feeds = [INDEX_FEED, author_feed(author_id)]
+    if group_id is not None:
+        feeds.append(group_feed(group_id))
+    return feeds
+
+
+def count_key(feed):
+    return f'posts:count:{feed}'
+
+
+def get_count(feed, compute):
+    """Число постов ленты из кеша, при промахе считается через compute."""
+    key = count_key(feed)
+    value = cache.get(key)
+    metrics.cache_requests.inc(
+        cache='count', result='miss' if value is None else 'hit')
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.POSTS_COUNT_CACHE_TIMEOUT)
+    return value
+
+
+def invalidate_counts(feeds):
+    cache.delete_many([count_key(feed) for feed in feeds])
+
+
+def version_key(feed):
+    return f'posts:version:{feed}'
+
+
+def _now_version():
+    # Версия - время изменения в миллисекундах: она не повторяет старые,
+    # если ключ вытеснен из кеша, и служит датой Last-Modified ленты.
+    return int(time.time() * 1000)
+
+
+def get_feed_version(feed):
+    """Текущая версия ленты, часть ключа кеша ее фрагментов."""
+    key = version_key(feed)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_feed_versions(feeds):
+    now = _now_version()
+    versions = cache.get_many([version_key(feed) for feed in feeds])
+    cache.set_many({
+        version_key(feed): max(now, versions.get(version_key(feed), 0) + 1)
+        for feed in feeds
+    }, None)
+
+
+def feed_last_modified(versions):
+    """Время последнего изменения лент по их версиям."""
+    return datetime.fromtimestamp(max(versions) / 1000, tz=timezone.utc)
+
+
+# Отметка в кеше объектов: такого объекта в базе нет.
+MISSING = 'missing'
+
+
+def object_key(model, **lookup):
+    # Адрес может содержать символы, недопустимые в ключах memcached.
+    fields = ':'.join(f'{field}={value}' for field, value in lookup.items())
+    digest = hashlib.md5(fields.encode()).hexdigest()
+    return f'posts:object:{model._meta.label_lower}:{digest}'
+
+
+def get_object(queryset, feed, **lookup):
+    """Объект по lookup из кеша, при промахе - из queryset; None, если
+    объекта нет.
+
+    Объект хранится вместе с версией своей ленты feed(pk) и годен, пока
+    она не сменилась: ее поднимает любое изменение постов, подписок и
+    самой записи, от которых зависят счетчики объекта. Отсутствие
+    объекта кешируется на OBJECT_CACHE_MISS_TIMEOUT и сбрасывается
+    forget_object() при создании объекта. Объект, лента которого
+    сменилась во время чтения, и прочитанное с реплики сразу после
+    записи (page_cache.may_store()) не кешируются.
+    """
+    key = object_key(queryset.model, **lookup)
+    entry = cache.get(key)
+    if entry == MISSING:
+        metrics.cache_requests.inc(cache='object', result='hit')
+        return None
+    if entry is not None:
+        version, obj = entry
+        if get_feed_version(feed(obj.pk)) == version:
+            metrics.cache_requests.inc(cache='object', result='hit')
+            return obj
+    metrics.cache_requests.inc(cache='object', result='miss')
+    started = _now_version()
+    obj = queryset.filter(**lookup).first()
+    if not page_cache.may_store():
+        return obj
+    if obj is None:
+        cache.set(key, MISSING, settings.OBJECT_CACHE_MISS_TIMEOUT)
+        return None
+    # Версия - время изменения. Если ее подняли после начала чтения,
+    # запись могла зафиксироваться уже после него, и прочитанный объект
+    # лег бы в кеш под новой версией устаревшим. Версии, которой не
+    # было в кеше, никто с тех пор не поднимал.
+    bumped = cache.get(version_key(feed(obj.pk)))
+    version = get_feed_version(feed(obj.pk))
+    if bumped is None or bumped < started:
+        cache.set(key, (version, obj), settings.OBJECT_CACHE_TIMEOUT)
+    return obj
+
+
+def forget_object(model, **lookup):
+    cache.delete(object_key(model, **lookup))
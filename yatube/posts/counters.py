@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
+
+from . import timelines
+from .models import AuthorStats, Follow, Group, Post, User
+
+
+def _change(queryset, delta, field='posts_count'):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _change_stats(author_id, delta, field):
+    stats = AuthorStats.objects.filter(author_id=author_id)
+    if not _change(stats, delta, field):
+        if delta > 0:
+            AuthorStats.objects.get_or_create(author_id=author_id)
+            _change(stats, delta, field)
+
+
+def change_author_count(author_id, delta):
+    _change_stats(author_id, delta, 'posts_count')
+
+
+def change_followers_count(author_id, delta):
+    _change_stats(author_id, delta, 'followers_count')
+
+
+def change_group_count(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), delta)
+
+
+def note_group_post(post):
+    """Запоминает новый пост как последний в группе, если он новее."""
+    if post.group_id is None:
+        return
+    Group.objects.filter(pk=post.group_id).filter(
+        Q(last_post_date__isnull=True) | Q(last_post_date__lte=post.pub_date)
+    ).update(last_post_date=post.pub_date, last_post_author=post.author_id)
+
+
+def refresh_group_latest(group_id):
+    """Находит последний пост группы заново, например после удаления.
+
+    Это один запрос по индексу ленты группы.
+    """
+    if group_id is None:
+        return
+    latest = (
+        Post.objects.filter(group_id=group_id)
+        .order_by('-pub_date', '-id')
+        .values('pub_date', 'author_id')
+        .first()
+    ) or {'pub_date': None, 'author_id': None}
+    Group.objects.filter(pk=group_id).update(
+        last_post_date=latest['pub_date'],
+        last_post_author=latest['author_id']
+    )
+
+
+def _count_rows(model, field):
+    """Подзапрос с числом строк model для строки внешнего запроса."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def _count_posts(field):
+    return _count_rows(Post, field)
+
+
+def _latest_group_post(field):
+    """Подзапрос с полем последнего поста группы внешнего запроса."""
+    return Subquery(
+        Post.objects.filter(group=OuterRef('pk'))
+        .order_by('-pub_date', '-id')
+        .values(field)[:1]
+    )
+
+
+@transaction.atomic
+def recount_posts():
+    """Пересчитывает счетчики постов и подписчиков всех авторов и групп,
+    последний пост каждой группы и список знаменитостей."""
+    missing = User.objects.filter(stats__isnull=True)
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=pk) for pk in missing.values_list(
+            'pk', flat=True).iterator()],
+        ignore_conflicts=True
+    )
+    authors = AuthorStats.objects.update(
+        posts_count=_count_posts('author'),
+        followers_count=_count_rows(Follow, 'author'),
+    )
+    celebrities = AuthorStats.objects.filter(
+        merge_on_read=False,
+        followers_count__gt=settings.FOLLOW_FANOUT_LIMIT
+    ).values_list('author_id', flat=True)
+    for author_id in list(celebrities):
+        timelines.mark_celebrity(author_id)
+    groups = Group.objects.update(
+        posts_count=_count_posts('group'),
+        last_post_date=_latest_group_post('pub_date'),
+        last_post_author=_latest_group_post('author_id'),
+    )
+    return authors, groups
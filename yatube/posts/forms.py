@@ -7,8 +7,9 @@ class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
-        fields = ("text", 'group')
+        fields = ("text", 'group', 'image')
         labels = {
             "text": "Текст поста",
             "group": "Группа поста",
+            "image": "Картинка",
         }
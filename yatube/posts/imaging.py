@@ -0,0 +1,58 @@
+"""Уменьшенные копии картинок постов.
+
+Модуль выполняется в процессах фонового обработчика, поэтому не
+импортирует Django: ему передаются пути и размеры, а результат
+сохраняет основной процесс.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_DIR = 'thumbnails'
+JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': True}
+
+
+def variant_name(name, variant):
+    return f'{THUMBNAIL_DIR}/{variant}/{name}.jpg'
+
+
+def open_rgb(path):
+    """Картинка в RGB с учетом поворота из EXIF и белым фоном вместо
+    прозрачности."""
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+
+def render_variants(root, name, variants):
+    """Пишет копии картинки root/name, возвращает их имена и размеры.
+
+    variants: вариант -> (ширина, высота, обрезать). С обрезкой копия
+    заполняет рамку целиком, без нее вписывается в рамку. Файл пишется
+    под временным именем и переименовывается, чтобы страница никогда не
+    сослалась на недописанную копию.
+    """
+    image = open_rgb(os.path.join(root, name))
+    result = {}
+    for variant, (width, height, crop) in variants.items():
+        if crop:
+            thumbnail = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, height), Image.LANCZOS)
+        target = variant_name(name, variant)
+        path = os.path.join(root, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        thumbnail.save(f'{path}.tmp', 'JPEG', **JPEG_OPTIONS)
+        os.replace(f'{path}.tmp', path)
+        result[variant] = {
+            'name': target,
+            'width': thumbnail.width,
+            'height': thumbnail.height,
+        }
+    return result
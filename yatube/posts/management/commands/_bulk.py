@@ -0,0 +1,46 @@
+import time
+from posts.models import Post
+
+
+def insert_posts_sql():
+    """Запрос для executemany, который вставляет посты без картинок.
+
+    Строки - (text, pub_date, author_id, group_id), дата уже приведена
+    connection.ops.adapt_datetimefield_value. Вставка мимо модели не
+    вызывает pre_save, и auto_now_add не заменяет pub_date текущим
+    временем.
+    """
+    columns = ', '.join(
+        Post._meta.get_field(name).column
+        for name in (
+            'text', 'pub_date', 'author', 'group', 'image', 'image_variants'
+        ))
+    return (
+        f'INSERT INTO {Post._meta.db_table} ({columns}) '
+        "VALUES (%s, %s, %s, %s, '', '')"
+    )
+
+
+class RateReporter:
+    """Печатает, сколько записей обработано и с какой скоростью."""
+
+    def __init__(self, stdout, every=10000):
+        self.stdout = stdout
+        self.every = every
+        self.started = time.monotonic()
+        self.counts = {}
+        self.reported = 0
+
+    def add(self, kind, num):
+        self.counts[kind] = self.counts.get(kind, 0) + num
+        total = sum(self.counts.values())
+        if total - self.reported >= self.every:
+            self.reported = total
+            self.stdout.write(self.line())
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        parts = ', '.join(
+            f'{kind}: {num}' for kind, num in self.counts.items())
+        rate = sum(self.counts.values()) / elapsed
+        return f'{parts} ({rate:.0f} записей/с, {elapsed:.1f} с)'
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Group, Post, User
+
+from ._bulk import RateReporter
+
+
+class Command(BaseCommand):
+    help = 'Выгружает авторов, группы и посты в JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            self.export(self.stdout, options['chunk_size'], self.stderr)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as out:
+            self.export(out, options['chunk_size'], self.stdout)
+
+    def write(self, out, record):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def export(self, out, chunk_size, log):
+        reporter = RateReporter(log)
+        authors = User.objects.filter(
+            pk__in=Post.objects.values('author_id')
+        ).order_by('pk').values_list(
+            'username', 'first_name', 'last_name', 'email')
+        for username, first_name, last_name, email in (
+                authors.iterator(chunk_size=chunk_size)):
+            self.write(out, {
+                'model': 'user',
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email,
+            })
+            reporter.add('authors', 1)
+        groups = Group.objects.order_by('pk').values_list(
+            'slug', 'title', 'description')
+        for slug, title, description in groups.iterator(
+                chunk_size=chunk_size):
+            self.write(out, {
+                'model': 'group',
+                'slug': slug,
+                'title': title,
+                'description': description,
+            })
+            reporter.add('groups', 1)
+        posts = Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug')
+        for text, pub_date, author, group in posts.iterator(
+                chunk_size=chunk_size):
+            self.write(out, {
+                'model': 'post',
+                'text': text,
+                'pub_date': pub_date.isoformat(),
+                'author': author,
+                'group': group,
+            })
+            reporter.add('posts', 1)
+        log.write(self.style.SUCCESS(reporter.line()))
@@ -0,0 +1,184 @@
+import json
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, search
+from posts.cache import INDEX_FEED, author_feed, group_feed
+from posts.models import Group, Post, User
+from posts.signals import invalidate_feeds
+
+from ._bulk import RateReporter, insert_posts_sql
+
+# Поля, которые загрузка принимает у записей, и обязательные из них.
+FIELDS = {
+    'user': {'username', 'first_name', 'last_name', 'email'},
+    'group': {'slug', 'title', 'description'},
+    'post': {'text', 'pub_date', 'author', 'group'},
+}
+REQUIRED = {
+    'user': {'username'},
+    'group': {'slug', 'title'},
+    'post': {'text', 'pub_date', 'author'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает авторов, группы и посты из JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл с выгрузкой, по умолчанию stdin'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.reporter = RateReporter(self.stdout)
+        self.user_ids = {}
+        self.group_ids = {}
+        self.batches = {'user': [], 'group': [], 'post': []}
+        if options['input'] == '-':
+            self.load(sys.stdin)
+        else:
+            with open(options['input'], encoding='utf-8') as lines:
+                self.load(lines)
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(self.reporter.line()))
+
+    def load(self, lines):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                model = record.pop('model')
+                batch = self.batches[model]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise CommandError(f'Строка {number}: неизвестная запись')
+            unknown = record.keys() - FIELDS[model]
+            if unknown:
+                raise CommandError(
+                    f'Строка {number}: неизвестные поля '
+                    f'{", ".join(sorted(unknown))}'
+                )
+            missing = REQUIRED[model] - record.keys()
+            if missing:
+                raise CommandError(
+                    f'Строка {number}: нет полей '
+                    f'{", ".join(sorted(missing))}'
+                )
+            if model == 'post':
+                record['pub_date'] = self.parse_pub_date(
+                    record['pub_date'], number)
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.flush()
+        self.flush()
+
+    def parse_pub_date(self, value, number):
+        try:
+            pub_date = parse_datetime(value)
+        except (TypeError, ValueError):
+            pub_date = None
+        if pub_date is None:
+            raise CommandError(
+                f'Строка {number}: неверная дата pub_date {value!r}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return pub_date
+
+    def flush(self):
+        # Посты ссылаются на авторов и группы, поэтому они сохраняются
+        # последними, даже если строки в файле перемешаны.
+        self.flush_users()
+        self.flush_groups()
+        self.flush_posts()
+
+    @transaction.atomic
+    def flush_users(self):
+        batch = self.batches['user']
+        if not batch:
+            return
+        User.objects.bulk_create(
+            [User(**record) for record in batch], ignore_conflicts=True)
+        self.resolve(User, 'username', self.user_ids,
+                     [record['username'] for record in batch])
+        self.reporter.add('authors', len(batch))
+        batch.clear()
+
+    @transaction.atomic
+    def flush_groups(self):
+        batch = self.batches['group']
+        if not batch:
+            return
+        Group.objects.bulk_create(
+            [Group(**record) for record in batch], ignore_conflicts=True)
+        self.resolve(Group, 'slug', self.group_ids,
+                     [record['slug'] for record in batch])
+        self.reporter.add('groups', len(batch))
+        batch.clear()
+
+    def resolve(self, model, field, ids, keys):
+        """Дополняет карту ключ -> id записями, которых в ней еще нет."""
+        missing = {key for key in keys if key is not None} - ids.keys()
+        if missing:
+            ids.update(model.objects.filter(
+                **{f'{field}__in': missing}).values_list(field, 'pk'))
+
+    @transaction.atomic
+    def flush_posts(self):
+        batch = self.batches['post']
+        if not batch:
+            return
+        self.resolve(User, 'username', self.user_ids,
+                     [record['author'] for record in batch])
+        self.resolve(Group, 'slug', self.group_ids,
+                     [record.get('group') for record in batch])
+        # Вставка мимо модели сохраняет pub_date из выгрузки:
+        # bulk_create заменил бы его текущим временем из-за auto_now_add.
+        adapt_date = connection.ops.adapt_datetimefield_value
+        posts = []
+        for record in batch:
+            author_id = self.user_ids.get(record['author'])
+            if author_id is None:
+                raise CommandError(f'Неизвестный автор {record["author"]}')
+            posts.append(Post(
+                text=record['text'],
+                pub_date=record['pub_date'],
+                author_id=author_id,
+                group_id=self.group_ids.get(record.get('group')),
+            ))
+        with connection.cursor() as cursor:
+            cursor.executemany(insert_posts_sql(), [
+                (post.text, adapt_date(post.pub_date), post.author_id,
+                 post.group_id)
+                for post in posts
+            ])
+        self.update_counters(posts)
+        self.reporter.add('posts', len(batch))
+        batch.clear()
+
+    def update_counters(self, posts):
+        """Обновляет счетчики и кеш лент, которых коснулась пачка.
+
+        bulk_create не вызывает сигналы постов, поэтому то же, что они
+        делают для одного поста, здесь делается для пачки целиком.
+        """
+        authors = Counter(post.author_id for post in posts)
+        groups = Counter(
+            post.group_id for post in posts if post.group_id is not None)
+        feeds = {INDEX_FEED}
+        for author_id, added in authors.items():
+            counters.change_author_count(author_id, added)
+            feeds.add(author_feed(author_id))
+        for group_id, added in groups.items():
+            counters.change_group_count(group_id, added)
+            counters.refresh_group_latest(group_id)
+            feeds.add(group_feed(group_id))
+        invalidate_feeds(feeds)
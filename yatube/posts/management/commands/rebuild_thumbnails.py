@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Делает уменьшенные копии картинок постов, которые не успел '
+        'обработать фоновый пул'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии всех картинок, например после смены '
+                 'POST_IMAGE_VARIANTS'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild(missing_only=not options['all'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}'
+        ))
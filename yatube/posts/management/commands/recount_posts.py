@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов и подписчиков у авторов и групп'
+
+    def handle(self, *args, **options):
+        authors, groups = recount_posts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано авторов: {authors}, групп: {groups}'
+        ))
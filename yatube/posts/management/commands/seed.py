@@ -0,0 +1,252 @@
+import datetime as dt
+import itertools
+import random
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import page_cache
+from posts import cache, search
+from posts.counters import recount_posts
+from posts.models import (AuthorStats, Follow, Group, Post, TimelineEntry,
+                          User)
+
+from ._bulk import RateReporter, insert_posts_sql
+
+WORDS = (
+    'лента пост автор группа новость заметка день город музыка кино '
+    'книга работа отпуск погода фото встреча проект идея вопрос ответ '
+    'утро вечер неделя друзья семья дорога море горы код релиз отчет'
+).split()
+# Тексты постов берутся из заранее собранного набора: генерация текста
+# на каждый пост занимала бы больше времени, чем его вставка.
+TEXT_POOL_SIZE = 4096
+# Дата последнего поста по умолчанию постоянна: с текущей датой тот же
+# --seed давал бы в разные дни разные данные.
+DEFAULT_END = dt.date(2024, 1, 1)
+
+
+def zipf_cum_weights(size, exponent):
+    """Накопленные веса закона Ципфа: k-й по популярности весит 1 / k^s."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими авторами, группами и постами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Одинаковый seed и параметры дают одинаковые данные'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель закона Ципфа для авторов и групп'
+        )
+        parser.add_argument(
+            '--no-group', type=float, default=0.3,
+            help='Доля постов без группы'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --end распределены посты'
+        )
+        parser.add_argument(
+            '--end', type=dt.date.fromisoformat,
+            default=DEFAULT_END,
+            help='Дата последнего поста, YYYY-MM-DD, '
+                 f'по умолчанию {DEFAULT_END}'
+        )
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Удалить данные, созданные раньше с тем же префиксом'
+        )
+        parser.add_argument(
+            '--no-search-index', action='store_true',
+            help='Не строить поисковый индекс, его соберет '
+                 'rebuild_search_index'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.reporter = RateReporter(self.stdout, every=100000)
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один автор')
+        deleted_feeds = set()
+        if self.seeded_users().exists() or self.seeded_groups().exists():
+            if not options['replace']:
+                raise CommandError(
+                    f'В базе уже есть данные с префиксом {self.prefix}, '
+                    'запустите с --replace'
+                )
+            deleted_feeds = self.delete_seeded()
+        end = timezone.make_aware(dt.datetime.combine(
+            options['end'], dt.time.max.replace(microsecond=0)))
+        self.start = end - dt.timedelta(days=options['days'])
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        with self.without_feed_indexes():
+            self.create_posts(
+                options['posts'], user_ids, group_ids,
+                options['skew'], options['no_group'], end
+            )
+        recount_posts()
+        if not options['no_search_index']:
+            search.rebuild_index()
+        feeds = {cache.INDEX_FEED, *deleted_feeds}
+        feeds.update(cache.author_feed(pk) for pk in user_ids)
+        feeds.update(cache.group_feed(pk) for pk in group_ids)
+        cache.invalidate_counts(feeds)
+        cache.bump_feed_versions(feeds)
+        page_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(self.reporter.line()))
+
+    def seeded_users(self):
+        return User.objects.filter(username__startswith=f'{self.prefix}_')
+
+    def seeded_groups(self):
+        return Group.objects.filter(slug__startswith=f'{self.prefix}-')
+
+    @transaction.atomic
+    def delete_seeded(self):
+        """Удаляет данные с префиксом и возвращает ленты удаленных авторов
+        и групп.
+
+        delete() через ORM вызвал бы сигналы на каждую строку, поэтому
+        строки удаляются напрямую, а счетчики и версии лент потом
+        пересчитывает и поднимает handle().
+        """
+        users = self.seeded_users()
+        groups = self.seeded_groups()
+        feeds = {cache.author_feed(pk)
+                 for pk in users.values_list('pk', flat=True)}
+        feeds.update(cache.group_feed(pk)
+                     for pk in groups.values_list('pk', flat=True))
+        related = Q(user__in=users) | Q(author__in=users)
+        TimelineEntry.objects.filter(related)._raw_delete(connection.alias)
+        Follow.objects.filter(related)._raw_delete(connection.alias)
+        Post.objects.filter(author__in=users)._raw_delete(connection.alias)
+        Post.objects.filter(group__in=groups).update(group=None)
+        AuthorStats.objects.filter(author__in=users)._raw_delete(
+            connection.alias)
+        Group.objects.filter(last_post_author__in=users).update(
+            last_post_author=None)
+        for through in (User.groups.through, User.user_permissions.through):
+            through.objects.filter(user__in=users)._raw_delete(
+                connection.alias)
+        groups._raw_delete(connection.alias)
+        users._raw_delete(connection.alias)
+        return feeds
+
+    @transaction.atomic
+    def bulk_create(self, model, objects, kind):
+        """Сохраняет объекты пачками по batch_size в одной транзакции."""
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch)
+            self.reporter.add(kind, len(batch))
+
+    @contextmanager
+    def without_feed_indexes(self):
+        """Снимает индексы лент на время вставки и строит их в конце.
+
+        Построить индекс по готовой таблице быстрее, чем обновлять его
+        на каждой вставленной строке. Индексы возвращаются и при ошибке.
+        """
+        if connection.in_atomic_block:
+            # Внутри транзакции SQLite не дает менять схему.
+            yield
+            return
+        with connection.schema_editor() as editor:
+            for index in Post._meta.indexes:
+                editor.remove_index(Post, index)
+        try:
+            yield
+        finally:
+            self.stdout.write('Строятся индексы лент')
+            with connection.schema_editor() as editor:
+                for index in Post._meta.indexes:
+                    editor.add_index(Post, index)
+
+    def create_users(self, number):
+        self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}_user_{index}',
+                first_name=f'Автор {index}',
+                password='!',
+                date_joined=self.start,
+            ) for index in range(number)
+        ), 'authors')
+        return self.shuffled_ids(self.seeded_users())
+
+    def create_groups(self, number):
+        self.bulk_create(Group, (
+            Group(
+                title=f'Группа {index}',
+                slug=f'{self.prefix}-group-{index}',
+                description=self.text(),
+            ) for index in range(number)
+        ), 'groups')
+        return self.shuffled_ids(self.seeded_groups())
+
+    def shuffled_ids(self, queryset):
+        """id в случайном порядке: порядок задает популярность."""
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        self.rng.shuffle(ids)
+        return ids
+
+    def text(self):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(5, 40)))
+
+    @transaction.atomic
+    def create_posts(self, number, user_ids, group_ids, skew, no_group, end):
+        """Посты идут по времени: id растут вместе с pub_date."""
+        author_weights = zipf_cum_weights(len(user_ids), skew)
+        group_weights = zipf_cum_weights(len(group_ids), skew)
+        texts = [self.text() for _ in range(TEXT_POOL_SIZE)]
+        step = (end - self.start) / max(number, 1)
+        # Наивное время в UTC не проходит через перевод часовых поясов.
+        start = timezone.make_naive(self.start, timezone.utc)
+        # На миллионах постов создание объектов моделей для bulk_create
+        # стоит дороже самой вставки, поэтому строки идут в executemany.
+        # Синтетические посты без картинок.
+        sql = insert_posts_sql()
+        adapt_date = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            for offset in range(0, number, self.batch_size):
+                size = min(self.batch_size, number - offset)
+                authors = self.rng.choices(
+                    user_ids, cum_weights=author_weights, k=size)
+                groups = [None] * size
+                if group_ids:
+                    groups = [
+                        group_id if self.rng.random() >= no_group else None
+                        for group_id in self.rng.choices(
+                            group_ids, cum_weights=group_weights, k=size)
+                    ]
+                rows = [
+                    (
+                        self.rng.choice(texts),
+                        adapt_date(start + step * (
+                            offset + index + self.rng.random())),
+                        authors[index],
+                        groups[index],
+                    )
+                    for index in range(size)
+                ]
+                cursor.executemany(sql, rows)
+                self.reporter.add('posts', size)
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    authors = (
+        Post.objects.order_by().values_list('author_id')
+        .annotate(total=models.Count('pk'))
+    )
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=pk, posts_count=total)
+         for pk, total in authors.iterator()],
+        batch_size=1000
+    )
+    groups = (
+        Post.objects.filter(group__isnull=False).order_by()
+        .values_list('group_id').annotate(total=models.Count('pk'))
+    )
+    for pk, total in groups.iterator():
+        Group.objects.filter(pk=pk).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0003_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
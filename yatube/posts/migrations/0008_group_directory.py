@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_latest_posts(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+
+    def latest(field):
+        return models.Subquery(
+            Post.objects.filter(group=models.OuterRef('pk'))
+            .order_by('-pub_date', '-id').values(field)[:1]
+        )
+
+    Group.objects.update(
+        last_post_date=latest('pub_date'),
+        last_post_author=latest('author_id')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_post_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_author',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор последнего поста'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_post_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата последнего поста'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title', 'id'], name='group_directory_idx'),
+        ),
+        migrations.RunPython(fill_latest_posts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils.functional import cached_property
 
 User = get_user_model()
 
@@ -8,6 +12,31 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+        editable=False
+    )
+    last_post_date = models.DateTimeField(
+        verbose_name='Дата последнего поста',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    last_post_author = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Автор последнего поста'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'id'], name='group_directory_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
@@ -37,9 +66,153 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Выберите группу'
     )
+    image = models.ImageField(
+        verbose_name='Картинка',
+        upload_to='posts/',
+        blank=True
+    )
+    # Готовые уменьшенные копии картинки: вариант -> имя файла и размеры.
+    # Их пишет фоновый обработчик, а страницы берут размеры отсюда и не
+    # обращаются к файлам.
+    image_variants = models.TextField(
+        verbose_name='Уменьшенные копии картинки',
+        blank=True,
+        editable=False
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
+
+    @cached_property
+    def thumbnails(self):
+        """Готовые копии картинки: вариант -> url, width, height."""
+        if not self.image_variants:
+            return {}
+        return {
+            variant: dict(meta, url=default_storage.url(meta['name']))
+            for variant, meta in json.loads(self.image_variants).items()
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {
+            name: loaded[name]
+            for name in ('author_id', 'group_id', 'image') if name in loaded
+        }
+        return instance
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0
+    )
+    # Посты автора с большим числом подписчиков не раскладываются по их
+    # лентам, а подмешиваются при чтении. Флаг не снимается сам: иначе
+    # посты, написанные, пока он стоял, пропали бы из лент подписчиков.
+    merge_on_read = models.BooleanField(
+        verbose_name='Подмешивать посты при чтении',
+        default=False,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя, разложенный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_feed_idx'
+            ),
+        ]
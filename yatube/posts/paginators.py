@@ -0,0 +1,385 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import timelines
+from .cache import INDEX_FEED, get_count
+from .models import Post, TimelineEntry
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+class KeysetPage(Page):
+    """Страница, которая ищет записи по ключу, а не по смещению."""
+
+    def __init__(self, object_list, paginator, key=None, direction=NEXT):
+        self._queryset = object_list
+        self.paginator = paginator
+        self.key = key
+        self.direction = direction
+        self.number = None
+
+    def __repr__(self):
+        return f'<Keyset page after {self.key}>'
+
+    @cached_property
+    def _rows(self):
+        limit = self.paginator.per_page + 1
+        rows = list(self._queryset[:limit])
+        if self.direction == PREVIOUS:
+            rows.reverse()
+        return rows
+
+    @property
+    def _has_extra_row(self):
+        return len(self._rows) > self.paginator.per_page
+
+    @property
+    def object_list(self):
+        if not self._has_extra_row:
+            return self._rows
+        if self.direction == PREVIOUS:
+            return self._rows[1:]
+        return self._rows[:-1]
+
+    @property
+    def is_keyset(self):
+        return True
+
+    def has_next(self):
+        if self.direction == PREVIOUS:
+            return self.key is not None
+        return self._has_extra_row
+
+    def has_previous(self):
+        if self.direction == PREVIOUS:
+            return self._has_extra_row
+        return self.key is not None
+
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
+
+
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки вместо OFFSET.
+
+    Каждая страница выбирается условием «строго после последней записи
+    предыдущей страницы», поэтому запрос не зависит от глубины страницы
+    и не требует COUNT(*). Курсор хранит значения полей сортировки и
+    направление перехода.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def _fields(self):
+        return [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name, _ in self._fields():
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (ключ, направление) или (None, NEXT) для мусора."""
+        if not cursor:
+            return None, NEXT
+        padding = '=' * (-len(cursor) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            return None, NEXT
+        fields = self._fields()
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(fields):
+            return None, NEXT
+        model = self.object_list.model
+        key = []
+        try:
+            for (name, _), value in zip(fields, values):
+                key.append(model._meta.get_field(name).to_python(value))
+        except ValidationError:
+            return None, NEXT
+        return tuple(key), direction
+
+    def _seek(self, key, direction):
+        """Условие «после ключа» для заданного направления обхода."""
+        condition = Q()
+        for position, (name, descending) in enumerate(self._fields()):
+            forward = descending != (direction == PREVIOUS)
+            lookup = 'lt' if forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': key[position]})
+            for prev_position in range(position):
+                prev_name = self._fields()[prev_position][0]
+                step &= Q(**{prev_name: key[prev_position]})
+            condition |= step
+        return condition
+
+    def _order_by(self, direction):
+        if direction == NEXT:
+            return self.ordering
+        return tuple(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        )
+
+    def seek(self, queryset, key, direction):
+        """queryset в порядке обхода, начиная сразу после ключа."""
+        queryset = queryset.order_by(*self._order_by(direction))
+        if key is not None:
+            queryset = queryset.filter(self._seek(key, direction))
+        return queryset
+
+    def get_page(self, cursor):
+        key, direction = self.decode_cursor(cursor)
+        return KeysetPage(
+            self.seek(self.object_list, key, direction), self, key, direction)
+
+    def page(self, cursor):
+        return self.get_page(cursor)
+
+
+class MergedKeysetPage(KeysetPage):
+    """Страница, собранная из нескольких источников ключей.
+
+    Каждый источник - выборка пар (pub_date, id) в порядке обхода,
+    уже ограниченная курсором. Из каждого берется не больше страницы,
+    ключи сливаются без повторов, а посты читаются одним запросом.
+    """
+
+    def __init__(self, sources, paginator, key=None, direction=NEXT):
+        super().__init__(paginator.object_list, paginator, key, direction)
+        self._sources = sources
+
+    @cached_property
+    def _rows(self):
+        limit = self.paginator.per_page + 1
+        keys = set()
+        for source in self._sources:
+            keys.update(source[:limit])
+        # Лента идет от новых к старым, переход назад - наоборот.
+        keys = sorted(keys, reverse=self.direction == NEXT)[:limit]
+        posts = self._queryset.in_bulk([pk for _, pk in keys])
+        rows = [posts[pk] for _, pk in keys if pk in posts]
+        if self.direction == PREVIOUS:
+            rows.reverse()
+        return rows
+
+
+class FollowFeedPaginator(KeysetPaginator):
+    """Лента подписок: разложенные при записи посты и посты авторов,
+    которые подмешиваются при чтении.
+
+    Страница стоит запрос к ленте, по запросу на каждую подписку на
+    знаменитость и запрос самих постов, сколько бы авторов ни было в
+    подписках.
+    """
+
+    def __init__(self, user_id, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page)
+        self.user_id = user_id
+
+    def get_page(self, cursor):
+        key, direction = self.decode_cursor(cursor)
+        timeline = KeysetPaginator(
+            TimelineEntry.objects.filter(user_id=self.user_id)
+            .values_list('pub_date', 'post_id'),
+            self.per_page, ordering=('-pub_date', '-post_id')
+        )
+        sources = [timeline.seek(timeline.object_list, key, direction)]
+        for author_id in timelines.followed_celebrities(self.user_id):
+            posts = Post.objects.filter(
+                author_id=author_id).values_list('pub_date', 'id')
+            sources.append(self.seek(posts, key, direction))
+        return MergedKeysetPage(sources, self, key, direction)
+
+
+def estimate_table_rows(model):
+    """Число строк таблицы модели по статистике базы или None.
+
+    Статистика обновляется ANALYZE и может отставать от таблицы, зато
+    читается одним запросом при любом ее размере.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+                    [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return None
+
+
+class WindowPage(Page):
+    """Страница, о следующей странице которой известно по лишней записи.
+
+    Записи выбираются при первом обращении, так что страница, список
+    которой взят из кеша фрагментов, в базу не ходит.
+    """
+
+    def __init__(self, object_list, number, paginator):
+        self._queryset = object_list
+        self.number = number
+        self.paginator = paginator
+
+    @cached_property
+    def _rows(self):
+        return list(self._queryset)
+
+    @property
+    def has_more(self):
+        return len(self._rows) > self.paginator.per_page
+
+    @property
+    def object_list(self):
+        return self._rows[:self.paginator.per_page]
+
+    def has_next(self):
+        return self.has_more
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self)
+
+    @cached_property
+    def page_window(self):
+        """Номера страниц вокруг текущей, не больше window с каждой
+        стороны.
+
+        Вперед окно доходит до последней страницы по оценке, но не
+        меньше чем до следующей, если она есть: оценка может отставать.
+        """
+        window = self.paginator.window
+        last = self.number + self.has_more
+        if self.has_more and self.paginator.num_pages:
+            last = max(
+                last, min(self.number + window, self.paginator.num_pages))
+        return range(max(1, self.number - window), last + 1)
+
+
+class WindowPaginator(Paginator):
+    """Paginator с окном номеров страниц и без COUNT(*).
+
+    Страница выбирается с одной лишней записью, по которой видно, есть
+    ли следующая. Общее число записей - необязательная оценка (число
+    или функция без аргументов), например счетчик постов группы; без
+    нее окно вперед показывает только следующую страницу. Номер за
+    концом ленты дает пустую страницу, а не поиск последней.
+    """
+
+    def __init__(self, object_list, per_page, estimate=None, window=None):
+        super().__init__(object_list, per_page)
+        self.estimate = estimate
+        self.window = window or settings.PAGINATION_WINDOW
+
+    @cached_property
+    def count(self):
+        if callable(self.estimate):
+            return self.estimate()
+        return self.estimate
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, -(-self.count // self.per_page))
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        return WindowPage(
+            self.object_list[offset:offset + self.per_page + 1],
+            number, self
+        )
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except InvalidPage:
+            return self.page(1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для админки, который не считает записи точно.
+
+    Для таблицы целиком число строк берется из статистики базы (или из
+    кеша ленты, если статистики нет), а отфильтрованная выборка
+    считается не дальше count_limit строк.
+    """
+    count_limit = 10000
+
+    def _count_rows(self):
+        return super().count
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_table_rows(self.object_list.model)
+            if estimate is not None:
+                return estimate
+            if self.object_list.model is Post:
+                return get_count(INDEX_FEED, self._count_rows)
+        return self.object_list[:self.count_limit].count()
@@ -0,0 +1,82 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def to_match_query(query):
+    """Переводит пользовательский запрос в выражение MATCH для FTS5.
+
+    Каждое слово берется в кавычки, чтобы операторы FTS5 из ввода
+    не исполнялись, и ищется по префиксу, чтобы находились словоформы.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заполняет индекс заново по таблице постов, возвращает число строк."""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        return cursor.rowcount
+
+
+def matching_ids(query):
+    """Подзапрос с id постов, подходящих под запрос."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [to_match_query(query)]
+    )
+
+
+def search_posts(queryset, query):
+    """Посты из queryset, подходящие под запрос, лучшие совпадения первыми.
+
+    Без SQLite поиск откатывается на LIKE по тексту.
+    """
+    if not to_match_query(query):
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = posts_post.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[to_match_query(query)],
+        select={'rank': f'{FTS_TABLE}.rank'},
+        order_by=['rank', '-pub_date'],
+    )
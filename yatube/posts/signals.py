@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import page_cache
+
+from . import cache, counters, search, thumbnails, timelines
+from .models import Follow, Group, Post, User
+
+
+def _invalidate(feeds):
+    cache.invalidate_counts(feeds)
+    cache.bump_feed_versions(feeds)
+    page_cache.bump_version()
+
+
+def invalidate_feeds(feeds):
+    """Сбрасывает кеш лент сразу и еще раз после фиксации транзакции.
+
+    Повторный сброс нужен, чтобы параллельный запрос не успел положить
+    в кеш число записей или фрагмент, посчитанные до коммита.
+    """
+    _invalidate(feeds)
+    transaction.on_commit(lambda: _invalidate(feeds))
+
+
+def forget_object(model, **lookup):
+    """Убирает объект из кеша объектов сразу и после коммита, чтобы
+    не осталась отметка о его отсутствии, поставленная до коммита."""
+    cache.forget_object(model, **lookup)
+    transaction.on_commit(lambda: cache.forget_object(model, **lookup))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    feeds = set(cache.post_feeds(instance.author_id, instance.group_id))
+    if created:
+        counters.change_author_count(instance.author_id, 1)
+        counters.change_group_count(instance.group_id, 1)
+        counters.note_group_post(instance)
+        timelines.push_post(instance)
+    else:
+        old_author_id = loaded.get('author_id', instance.author_id)
+        if old_author_id != instance.author_id:
+            counters.change_author_count(old_author_id, -1)
+            counters.change_author_count(instance.author_id, 1)
+            timelines.repush_post(instance)
+        old_group_id = loaded.get('group_id', instance.group_id)
+        if old_group_id != instance.group_id:
+            counters.change_group_count(old_group_id, -1)
+            counters.change_group_count(instance.group_id, 1)
+        if (old_group_id, old_author_id) != (
+                instance.group_id, instance.author_id):
+            for group_id in {old_group_id, instance.group_id}:
+                counters.refresh_group_latest(group_id)
+        feeds.update(cache.post_feeds(old_author_id, old_group_id))
+    old_image = '' if created else loaded.get('image', instance.image.name)
+    if (old_image or '') != (instance.image.name or ''):
+        thumbnails.image_changed(instance)
+    invalidate_feeds(feeds)
+    search.index_post(instance)
+    instance._loaded_values = {
+        'author_id': instance.author_id,
+        'group_id': instance.group_id,
+        'image': instance.image.name,
+    }
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author_count(instance.author_id, -1)
+    counters.change_group_count(instance.group_id, -1)
+    counters.refresh_group_latest(instance.group_id)
+    invalidate_feeds(cache.post_feeds(instance.author_id, instance.group_id))
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Название и адрес группы выводятся в ленте группы и на главной.
+    invalidate_feeds([cache.INDEX_FEED, cache.group_feed(instance.pk)])
+    forget_object(Group, slug=instance.slug)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Новая версия ленты автора сбрасывает его запись в кеше объектов,
+    # в том числе под прежним username. Вход пользователя сохраняет
+    # только last_login, которого нет ни в кеше, ни на страницах.
+    if update_fields == {'last_login'}:
+        return
+    feeds = [cache.author_feed(instance.pk)]
+    cache.bump_feed_versions(feeds)
+    transaction.on_commit(lambda: cache.bump_feed_versions(feeds))
+    forget_object(User, username=instance.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if raw or not created:
+        return
+    counters.change_followers_count(instance.author_id, 1)
+    timelines.mark_celebrity(instance.author_id)
+    timelines.backfill(instance.user_id, instance.author_id)
+    # Кнопка подписки на странице автора зависит от версии его ленты.
+    cache.bump_feed_versions([cache.author_feed(instance.author_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_followers_count(instance.author_id, -1)
+    timelines.remove_author(instance.user_id, instance.author_id)
+    cache.bump_feed_versions([cache.author_feed(instance.author_id)])
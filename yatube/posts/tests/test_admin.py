@@ -0,0 +1,63 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.admin_client = Client()
+        cls.admin_client.force_login(cls.admin)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_posts(self, num):
+        for x in range(num):
+            author = User.objects.create_user(username=f'Author{x}_{num}')
+            group = Group.objects.create(
+                title=f'Группа {x}', slug=f'group-{x}-{num}')
+            Post.objects.create(text=f'Пост {x}', author=author, group=group)
+
+    def changelist_queries(self):
+        url = reverse('admin:posts_post_changelist')
+        self.admin_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelist_does_not_load_all_groups(self):
+        """Список постов в админке не загружает все группы для выбора"""
+        self.add_posts(2)
+        few = self.changelist_queries()
+        Group.objects.bulk_create([
+            Group(title=f'Пустая {x}', slug=f'empty-{x}') for x in range(10)
+        ])
+        self.assertEqual(self.changelist_queries(), few)
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, 'Пустая')
+
+    def test_changelist_uses_estimated_count(self):
+        """Список постов не считает записи точно при фильтрации"""
+        self.add_posts(3)
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'),
+            {'pub_date__gte': '2000-01-01'}
+        )
+        cl = response.context['cl']
+        self.assertEqual(cl.result_count, 3)
+        self.assertIsNone(cl.full_result_count)
@@ -0,0 +1,185 @@
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.db.models.signals import post_delete
+from django.test import TestCase, TransactionTestCase
+
+from core import page_cache
+from posts.models import AuthorStats, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ExportImportPostsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='TestUser', first_name='Иван', password='pass')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        Post.objects.create(
+            text='Пост в группе', author=self.user, group=self.group)
+        Post.objects.create(text='Пост без группы', author=self.user)
+        User.objects.create_user(username='NoPosts')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'posts.jsonl')
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rmdir(self.tmp_dir)
+
+    def snapshot(self):
+        return sorted(Post.objects.values_list(
+            'text', 'pub_date', 'author__username', 'author__first_name',
+            'group__slug', 'group__title'))
+
+    def test_export_writes_jsonl(self):
+        """Выгрузка пишет по записи на строку, авторы и группы первыми"""
+        out = StringIO()
+        call_command('export_posts', stdout=out, stderr=StringIO())
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [record['model'] for record in records],
+            ['user', 'group', 'post', 'post'])
+        self.assertEqual(records[0]['username'], 'TestUser')
+        self.assertNotIn('password', records[0])
+
+    def test_import_restores_export(self):
+        """Загрузка выгрузки восстанавливает посты, группы и счетчики"""
+        expected = self.snapshot()
+        call_command('export_posts', output=self.path, stdout=StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        out = StringIO()
+        call_command('import_posts', self.path, batch_size=1, stdout=out)
+        self.assertEqual(self.snapshot(), expected)
+        self.assertIn('posts: 2', out.getvalue())
+        self.assertFalse(User.objects.filter(username='NoPosts').exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author__username='TestUser').posts_count,
+            2)
+        self.assertEqual(Group.objects.get(slug='test-slug').posts_count, 1)
+
+    def test_import_resets_page_cache(self):
+        """После загрузки закешированные страницы собираются заново"""
+        call_command('export_posts', output=self.path, stdout=StringIO())
+        version = page_cache.get_version()
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertNotEqual(page_cache.get_version(), version)
+
+    def test_import_rejects_unknown_fields(self):
+        """Загрузка сообщает о неизвестных полях записи"""
+        with open(self.path, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({
+                'model': 'user', 'username': 'New', 'is_superuser': True
+            }) + '\n')
+        with self.assertRaisesMessage(CommandError, 'is_superuser'):
+            call_command('import_posts', self.path, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='New').exists())
+
+    def test_import_rejects_broken_posts(self):
+        """Загрузка называет строку с неполным постом или неверной датой"""
+        records = {
+            'нет полей author': {'model': 'post', 'text': 'Пост',
+                                 'pub_date': '2024-01-01T00:00:00+00:00'},
+            'неверная дата': {'model': 'post', 'text': 'Пост',
+                              'pub_date': 'вчера', 'author': 'TestUser'},
+        }
+        for message, record in records.items():
+            with self.subTest(message=message):
+                with open(self.path, 'w', encoding='utf-8') as out:
+                    out.write('\n' + json.dumps(record) + '\n')
+                with self.assertRaisesMessage(
+                        CommandError, f'Строка 2: {message}'):
+                    call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_import_reuses_existing_rows(self):
+        """Загрузка привязывает посты к уже существующим авторам и группам"""
+        call_command('export_posts', output=self.path, stdout=StringIO())
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(self.user.posts.count(), 4)
+
+
+class SeedCommandTest(TransactionTestCase):
+    def seed(self, **options):
+        options = {
+            'users': 20, 'groups': 5, 'posts': 500, 'seed': 7,
+            'batch_size': 64, 'end': datetime.date(2021, 6, 30), 'days': 30,
+            **options,
+        }
+        call_command('seed', stdout=StringIO(), **options)
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+
+    def test_seed_creates_requested_rows(self):
+        """seed создает авторов, группы и посты с пересчитанными счетчиками"""
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 500)
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            500)
+        self.assertEqual(
+            sum(Group.objects.values_list('posts_count', flat=True)),
+            Post.objects.exclude(group=None).count())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, indexes)
+
+    def test_seed_is_skewed_and_ordered(self):
+        """Популярные авторы пишут больше, id растут вместе с датой"""
+        posts = self.seed()
+        counts = sorted(User.objects.annotate(
+            total=Count('posts')).values_list('total', flat=True))
+        self.assertGreater(counts[-1], 5 * counts[len(counts) // 2])
+        dates = [pub_date for _, pub_date, _, _ in posts]
+        self.assertEqual(dates, sorted(dates))
+        self.assertLessEqual(
+            dates[-1].date(), datetime.date(2021, 6, 30))
+
+    def test_seed_is_deterministic(self):
+        """Тот же seed дает те же данные, повтор требует --replace"""
+        first = self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(self.seed(replace=True), first)
+        self.assertNotEqual(self.seed(replace=True, seed=8), first)
+        self.assertEqual(Post.objects.count(), 500)
+
+    def test_seed_replace_removes_related_rows(self):
+        """--replace удаляет подписки и ленты подписок авторов с префиксом
+        без сигналов на каждую строку"""
+        self.seed()
+        reader = User.objects.create_user(username='reader')
+        seeded = User.objects.get(username='seed_user_0')
+        Follow.objects.create(user=reader, author=seeded)
+        Follow.objects.create(user=seeded, author=reader)
+        self.assertTrue(TimelineEntry.objects.filter(user=reader).exists())
+        deleted = []
+
+        def receiver(sender, **kwargs):
+            deleted.append(sender)
+
+        post_delete.connect(receiver)
+        self.addCleanup(post_delete.disconnect, receiver)
+        self.seed(replace=True)
+        self.assertEqual(deleted, [])
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=reader).followers_count, 0)
+        self.assertEqual(User.objects.count(), 21)
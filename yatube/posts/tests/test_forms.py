@@ -1,11 +1,15 @@
+import shutil
+import tempfile
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.forms import PostForm
 from posts.models import Group, Post
+from posts.tests.utils import image_upload
 
 User = get_user_model()
 
@@ -105,3 +109,34 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertRedirects(response, reverse(
             'posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+
+class PostImageFormTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='TestUser')
+        self.client.force_login(self.user)
+
+    def test_create_post_with_image(self):
+        """Форма сохраняет картинку поста"""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой', 'image': image_upload()})
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.image.name, 'posts/image.png')
+        self.assertEqual(post.image_variants, '')
+
+    def test_form_rejects_non_image(self):
+        """Файл, который не картинка, не проходит проверку"""
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с файлом',
+            'image': SimpleUploadedFile('text.png', b'not an image'),
+        })
+        self.assertFormError(
+            response, 'form', 'image',
+            'Загрузите правильное изображение. Файл, который вы загрузили, '
+            'поврежден или не является изображением.'
+        )
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-from ..models import Group, Post
+from .. import timelines
+from ..models import AuthorStats, Follow, Group, Post
 
 User = get_user_model()
 
@@ -58,3 +63,131 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value
                 )
+
+
+class MigrationsTest(TestCase):
+    def test_models_match_migrations(self):
+        """Проверка, что модели не расходятся с миграциями"""
+        out = StringIO()
+        try:
+            call_command(
+                'makemigrations', '--check', '--dry-run',
+                stdout=out, stderr=StringIO()
+            )
+        except SystemExit:
+            self.fail(f'Модели расходятся с миграциями:\n{out.getvalue()}')
+
+    def test_feed_queries_use_indexes(self):
+        """Проверка, что запросы лент идут по индексам"""
+        user = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Группа', slug='slug')
+        feeds = {
+            'post_feed_idx': Post.objects.all(),
+            'post_author_feed_idx': user.posts.all(),
+            'post_group_feed_idx': group.posts.all(),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset[:10].explain())
+
+
+class PostCountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.other_group = Group.objects.create(title='Другая', slug='other')
+        self.post = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='Тестовый пост',
+        )
+
+    def assertCounts(self, author, group, other_group):
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, author)
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group)
+        self.assertEqual(self.other_group.posts_count, other_group)
+
+    def test_create_increments_counters(self):
+        """Проверка, что новый пост увеличивает счетчики"""
+        self.assertCounts(1, 1, 0)
+        Post.objects.create(author=self.user, text='Без группы')
+        self.assertCounts(2, 1, 0)
+
+    def test_group_change_moves_counter(self):
+        """Проверка, что смена группы переносит пост между счетчиками"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertCounts(1, 0, 1)
+        post.text = 'Измененный пост'
+        post.save()
+        self.assertCounts(1, 0, 1)
+
+    def test_delete_decrements_counters(self):
+        """Проверка, что удаление поста уменьшает счетчики"""
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_recount_command_fixes_drift(self):
+        """Проверка, что команда пересчета восстанавливает счетчики"""
+        AuthorStats.objects.all().delete()
+        Group.objects.update(posts_count=7)
+        call_command('recount_posts', stdout=StringIO())
+        self.assertCounts(1, 1, 0)
+
+    @override_settings(FOLLOW_FANOUT_LIMIT=0)
+    def test_recount_command_fixes_followers(self):
+        """Проверка, что пересчет восстанавливает подписчиков и отмечает
+        знаменитостей"""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        AuthorStats.objects.update(followers_count=0, merge_on_read=False)
+        call_command('recount_posts', stdout=StringIO())
+        stats = AuthorStats.objects.get(author=self.user)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertTrue(stats.merge_on_read)
+        self.assertEqual(timelines.celebrity_ids(), [self.user.pk])
+
+    def assertLatest(self, group, post):
+        group.refresh_from_db()
+        if post is None:
+            self.assertIsNone(group.last_post_date)
+            self.assertIsNone(group.last_post_author_id)
+        else:
+            self.assertEqual(group.last_post_date, post.pub_date)
+            self.assertEqual(group.last_post_author_id, post.author_id)
+
+    def test_group_latest_post_follows_changes(self):
+        """Проверка, что последний пост группы обновляется при записи"""
+        self.assertLatest(self.group, self.post)
+        other = User.objects.create_user(username='other')
+        newer = Post.objects.create(
+            author=other, group=self.group, text='Новый пост')
+        self.assertLatest(self.group, newer)
+        newer.group = self.other_group
+        newer.save()
+        self.assertLatest(self.group, self.post)
+        self.assertLatest(self.other_group, newer)
+        newer.delete()
+        self.assertLatest(self.other_group, None)
+        Group.objects.update(last_post_date=None, last_post_author=None)
+        call_command('recount_posts', stdout=StringIO())
+        self.assertLatest(self.group, self.post)
+
+    def test_pages_show_author_counter(self):
+        """Проверка, что страницы показывают счетчик автора поста"""
+        other = User.objects.create_user(username='other')
+        client = Client()
+        client.force_login(other)
+        pages = {
+            reverse('posts:profile', kwargs={'username': 'auth'}):
+                'Всего постов: 1',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                '<span >1</span>',
+        }
+        for url, expected in pages.items():
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), expected)
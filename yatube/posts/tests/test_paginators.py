@@ -0,0 +1,212 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from yatube.settings import PAGINATION_NUM
+
+User = get_user_model()
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        cls.posts = Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый пост {x}',
+                author=cls.user,
+                group=cls.group,
+                pk=x + 1)
+            for x in range(13)
+        ])
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        """Проходит ленту по курсорам вперед и возвращает страницы"""
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.guest_client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            page_obj = response.context['page_obj']
+            pages.append(page_obj)
+            cursor = page_obj.next_cursor()
+        return pages
+
+    def test_keyset_pages_cover_feeds(self):
+        """Курсоры обходят каждую ленту без пропусков и повторов"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for url in urls:
+            with self.subTest(url=url):
+                pages = self.walk(url)
+                self.assertEqual(
+                    [len(page) for page in pages], [PAGINATION_NUM, 3])
+                self.assertEqual(
+                    [post for page in pages for post in page], expected)
+
+    def test_keyset_previous_cursor(self):
+        """Курсор назад возвращает на предыдущую страницу"""
+        first, second = self.walk(reverse('posts:index'))
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': second.previous_cursor()})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+        self.assertFalse(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+
+    def test_keyset_page_skips_count(self):
+        """Страница по курсору не считает записи в ленте"""
+        first, _ = self.walk(reverse('posts:index'))
+        with self.assertNumQueries(1):
+            list(first.paginator.get_page(first.next_cursor()))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'испорчен'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class WindowPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        cls.pages = 30
+        Post.objects.bulk_create([
+            Post(text=f'Тестовый пост {x}', author=cls.user, group=cls.group)
+            for x in range(PAGINATION_NUM * cls.pages)
+        ])
+        Group.objects.filter(pk=cls.group.pk).update(
+            posts_count=PAGINATION_NUM * cls.pages)
+        cls.url = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window_is_bounded(self):
+        """Паджинатор показывает окно номеров вокруг текущей страницы"""
+        window = settings.PAGINATION_WINDOW
+        cases = {
+            1: range(1, window + 2),
+            15: range(15 - window, 15 + window + 1),
+            self.pages: range(self.pages - window, self.pages + 1),
+        }
+        for number, expected in cases.items():
+            with self.subTest(page=number):
+                response = self.client.get(self.url, {'page': number})
+                page_obj = response.context['page_obj']
+                self.assertEqual(page_obj.page_window, expected)
+                self.assertLessEqual(
+                    response.content.count(b'page='), 2 * window + 3)
+        self.assertFalse(page_obj.has_next())
+
+    def test_feeds_skip_count(self):
+        """Ленты не считают посты запросом COUNT"""
+        urls = [
+            reverse('posts:index'),
+            self.url,
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'page': 2})
+                self.assertEqual(len(response.context['page_obj']),
+                                 PAGINATION_NUM)
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] for query in queries))
+
+    def test_cached_fragment_skips_page_query(self):
+        """Страница с закешированным списком постов не выбирает посты"""
+        client = Client()
+        client.force_login(self.user)
+        url = reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(any(
+            'FROM "posts_post"' in query['sql'] for query in queries))
+
+    def test_next_page_found_without_estimate(self):
+        """Без оценки числа постов следующая страница видна по лишней
+        записи, а номер за концом ленты дает пустую страницу"""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        response = self.client.get(self.url, {'page': 5})
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertEqual(
+            page_obj.page_window, range(5 - settings.PAGINATION_WINDOW, 7))
+        response = self.client.get(self.url, {'page': self.pages + 1})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='TestUser', first_name='Тест', last_name='Автор')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {x:02}', slug=f'group-{x}')
+            for x in range(PAGINATION_NUM * 2 + 5)
+        ]
+        for group in cls.groups[:PAGINATION_NUM]:
+            Post.objects.create(
+                text='Пост группы', author=cls.user, group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory_shows_group_stats(self):
+        """Каталог показывает число постов и последний пост группы"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:group_index'))
+        page = list(response.context['page_obj'])
+        self.assertEqual(page, self.groups[:PAGINATION_NUM])
+        self.assertEqual(page[0].posts_count, 1)
+        self.assertEqual(page[0].last_post_author, self.user)
+        self.assertContains(response, 'Тест Автор')
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': self.groups[0].slug}))
+
+    def test_directory_keyset_pages(self):
+        """Каталог листается по ключу и проходит все группы по разу"""
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(
+                reverse('posts:group_index') + f'?cursor={cursor}')
+            page = response.context['page_obj']
+            seen.extend(page)
+            cursor = page.next_cursor()
+        self.assertEqual(seen, self.groups)
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import page_cache
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Реплика - отдельный файл SQLite, который заполняет sync_replicas.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica1'] = dict(
+            connections.databases['default'],
+            NAME=os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.databases['replica1']
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='ReplicaUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='replica_slug')
+        self.post = Post.objects.create(
+            text='Пост на реплике', author=self.user, group=self.group)
+        call_command('sync_replicas', stdout=StringIO())
+        self.fresh_post = Post.objects.create(
+            text='Пост только в основной базе',
+            author=self.user, group=self.group
+        )
+
+    def test_feeds_read_from_replica(self):
+        """Ленты и страница поста читают с реплики"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, self.post.text)
+                self.assertNotContains(response, self.fresh_post.text)
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.fresh_post.pk}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_own_write_pins_reads_to_primary(self):
+        """После своей записи автор читает с основной базы, остальные -
+        с реплики"""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'},
+            follow=True
+        )
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, self.fresh_post.text)
+        self.assertTrue(
+            Post.objects.using('default').filter(text='Новый пост').exists())
+        self.assertFalse(
+            Post.objects.using('replica1').filter(text='Новый пост').exists())
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_edit_pins_reads_to_primary(self):
+        """Автор сразу видит правку, реплика отдает старый текст"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Исправленный пост', 'group': self.group.pk},
+            follow=True
+        )
+        self.assertContains(response, 'Исправленный пост')
+        self.assertContains(self.client.get(url), self.post.text)
+
+    def test_replica_pages_not_cached_right_after_write(self):
+        """Сразу после записи страница с отстающей реплики не кешируется"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIn(
+            'posts/index.html',
+            [template.name for template in response.templates])
+        with override_settings(DATABASE_PRIMARY_PIN_SECONDS=0):
+            Post.objects.create(text='Еще пост', author=self.user)
+            self.client.get(url)
+            response = self.client.get(url)
+        self.assertEqual(
+            [template.name for template in response.templates],
+            ['includes/header.html'])
+
+    def test_replica_fragment_not_shared_after_write(self):
+        """Фрагмент ленты с отстающей реплики не отдается после того, как
+        реплика догнала запись"""
+        url = reverse('posts:index')
+        self.assertNotContains(self.client.get(url), self.fresh_post.text)
+        Post.objects.using('replica1').bulk_create([self.fresh_post])
+        cache.delete(page_cache.BUMPED_KEY)
+        self.assertContains(self.client.get(url), self.fresh_post.text)
+
+    def test_replica_miss_not_cached_after_write(self):
+        """Отсутствие объекта на отстающей реплике не кешируется"""
+        group = Group.objects.create(title='Новая группа', slug='new_slug')
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        Group.objects.using('replica1').bulk_create([group])
+        cache.delete(page_cache.BUMPED_KEY)
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
@@ -0,0 +1,80 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from yatube.settings import PAGINATION_NUM
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post_once = Post.objects.create(
+            text='Кот сидит на окне', author=cls.user)
+        cls.post_twice = Post.objects.create(
+            text='Кот и еще раз кот', author=cls.user)
+        Post.objects.create(text='Собака лает', author=cls.user)
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_results(self):
+        """Поиск находит посты и ставит лучшие совпадения первыми"""
+        self.assertEqual(
+            self.search('кот'), [self.post_twice, self.post_once])
+        self.assertEqual(self.search('коты'), [])
+        self.assertEqual(self.search('ок'), [self.post_once])
+
+    def test_search_ignores_query_syntax(self):
+        """Операторы FTS5 во вводе не ломают поиск"""
+        for query in ['"', 'кот OR', 'NEAR(', '*', '']:
+            with self.subTest(query=query):
+                self.search(query)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.get(pk=self.post_once.pk)
+        post.text = 'Попугай сидит на окне'
+        post.save()
+        self.assertEqual(self.search('попугай'), [post])
+        self.assertEqual(self.search('кот'), [self.post_twice])
+        post.delete()
+        self.assertEqual(self.search('попугай'), [])
+
+    def test_search_pages_keep_query(self):
+        """Ссылки паджинатора сохраняют поисковый запрос"""
+        Post.objects.bulk_create([
+            Post(text=f'Кот номер {x}', author=self.user)
+            for x in range(PAGINATION_NUM)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.guest_client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        self.assertEqual(len(self.search('кот', page=2)), 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по полнотекстовому индексу"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+from posts.tests.utils import image_upload
+
+User = get_user_model()
+
+
+class PostThumbnailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='TestUser')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=image_upload())
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока копии нет, лента показывает заглушку, потом - копию"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Картинка обрабатывается')
+        thumbnails.schedule(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.thumbnails['feed']['width'], 960)
+        self.assertEqual(post.thumbnails['feed']['height'], 339)
+        self.assertLessEqual(post.thumbnails['detail']['width'], 960)
+        self.assertTrue(os.path.isfile(os.path.join(
+            settings.MEDIA_ROOT, post.thumbnails['feed']['name'])))
+        # Размеры и адрес копии берутся из базы, файлы не трогаются.
+        real_stat = os.stat
+
+        def stat(path, *args, **kwargs):
+            if str(path).startswith(settings.MEDIA_ROOT):
+                raise AssertionError(f'stat {path}')
+            return real_stat(path, *args, **kwargs)
+
+        with mock.patch('os.stat', side_effect=stat):
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Картинка обрабатывается')
+        self.assertContains(
+            response, f'src="{post.thumbnails["feed"]["url"]}" '
+                      'width="960" height="339"')
+
+    def test_new_image_resets_thumbnails(self):
+        """Смена картинки убирает старые копии до готовности новых"""
+        thumbnails.schedule(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        post.image = image_upload('other.png', color='blue')
+        post.save()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).image_variants, '')
+        self.assertFalse(thumbnails.save_variants(
+            self.post.pk, self.post.image.name, {}))
+
+    def test_rebuild_command(self):
+        """rebuild_thumbnails делает недостающие копии"""
+        output = StringIO()
+        call_command('rebuild_thumbnails', stdout=output)
+        self.assertIn('Обработано картинок: 1', output.getvalue())
+        self.assertIn('feed', Post.objects.get(pk=self.post.pk).thumbnails)
+
+
+class ThumbnailPoolTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='TestUser')
+        self.client.force_login(self.user)
+
+    def test_pool_makes_thumbnails_after_commit(self):
+        """Копии делает пул процессов после коммита"""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой', 'image': image_upload()})
+        post = Post.objects.get(text='Пост с картинкой')
+        deadline = time.monotonic() + 60
+        while not post.image_variants and time.monotonic() < deadline:
+            time.sleep(0.1)
+            post.refresh_from_db()
+        self.assertEqual(
+            set(post.thumbnails), set(settings.POST_IMAGE_VARIANTS))
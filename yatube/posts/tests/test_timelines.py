@@ -0,0 +1,129 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+from yatube.settings import PAGINATION_NUM
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.stranger = User.objects.create_user(username='TestStranger')
+        cls.old_post = Post.objects.create(
+            text='Старый пост автора', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        return self.client.post(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+
+    def feed_texts(self, cursor=''):
+        response = self.client.get(
+            reverse('posts:follow_index') + f'?cursor={cursor}')
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_and_unfollow(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает"""
+        response = self.follow(self.author)
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': self.author.username}))
+        self.follow(self.author)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 1)
+        Post.objects.create(text='Новый пост автора', author=self.author)
+        Post.objects.create(text='Пост чужого', author=self.stranger)
+        self.assertEqual(
+            self.feed_texts(), ['Новый пост автора', 'Старый пост автора'])
+        profile = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.author.username}))
+        self.assertContains(profile, 'Отписаться')
+        self.client.post(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    def test_cant_follow_self_or_by_get(self):
+        """На себя не подписаться, GET подписку не создает"""
+        self.follow(self.reader)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_guest_redirected_to_login(self):
+        response = Client().get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertIn(reverse('users:login'), response.url)
+
+    @override_settings(
+        FOLLOW_TIMELINE_LENGTH=3, FOLLOW_TIMELINE_TRIM_INTERVAL=1)
+    def test_timeline_is_bounded(self):
+        """Лента хранит не больше FOLLOW_TIMELINE_LENGTH постов"""
+        self.follow(self.author)
+        for number in range(5):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(
+            self.feed_texts(), ['Пост 4', 'Пост 3', 'Пост 2'])
+
+    @override_settings(FOLLOW_FANOUT_LIMIT=1)
+    def test_celebrity_posts_merged_on_read(self):
+        """Посты автора с множеством подписчиков подмешиваются при чтении"""
+        Follow.objects.create(user=self.stranger, author=self.author)
+        self.follow(self.author)
+        self.follow(self.stranger)
+        self.assertTrue(
+            AuthorStats.objects.get(author=self.author).merge_on_read)
+        for number in range(PAGINATION_NUM):
+            Post.objects.create(text=f'Звезда {number}', author=self.author)
+            Post.objects.create(text=f'Обычный {number}', author=self.stranger)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, author=self.author,
+            post__text__startswith='Звезда').exists())
+        first = self.client.get(reverse('posts:follow_index'))
+        page = first.context['page_obj']
+        self.assertEqual(
+            [post.text for post in page],
+            [f'{kind} {number}' for number in range(9, 4, -1)
+             for kind in ('Обычный', 'Звезда')]
+        )
+        second = self.feed_texts(page.next_cursor())
+        self.assertEqual(len(second), PAGINATION_NUM)
+        self.assertEqual(second[-1], 'Звезда 0')
+        self.assertEqual(self.feed_texts(
+            self.client.get(
+                reverse('posts:follow_index')
+                + f'?cursor={page.next_cursor()}'
+            ).context['page_obj'].next_cursor()
+        ), ['Старый пост автора'])
+
+    def test_feed_queries_do_not_grow_with_follows(self):
+        """Число запросов ленты не зависит от числа подписок"""
+        Post.objects.create(text='Пост автора', author=self.author)
+        self.follow(self.author)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('posts:follow_index'))
+        for number in range(20):
+            author = User.objects.create_user(username=f'TestAuthor{number}')
+            Post.objects.create(text=f'Пост {number}', author=author)
+            self.follow(author)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(response.context['page_obj']), PAGINATION_NUM)
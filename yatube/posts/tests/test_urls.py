@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client
 from django.test.testcases import TestCase
 
@@ -29,6 +30,9 @@ class StaticURLTests(TestCase):
             slug='test_group_slug'
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_common_pages_are_avaliable(self):
         """Общедоступные страницы доступны"""
         common_pages = [
@@ -1,11 +1,16 @@
 import datetime as dt
 from http import HTTPStatus
+from unittest import mock
 
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase
 from django.urls import reverse
 
+from posts import views
 from posts.models import Group, Post
 from yatube.settings import PAGINATION_NUM
 
@@ -39,6 +44,9 @@ class PostPagesTest(TestCase):
             for x in range(13)
         ])
 
+    def setUp(self):
+        cache.clear()
+
     def chek_context(self, response, user, group, num):
         for i in range(num):
             for j in range(num - 1, 0):
@@ -200,3 +208,331 @@ class PostPagesTest(TestCase):
         ))
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertNotIn(self.posts[0], response.context.get('page_obj'))
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов к базе не зависит от числа постов на странице"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        authors = [
+            User.objects.create_user(username=f'TestAuthor{x}')
+            for x in range(PAGINATION_NUM)
+        ]
+        groups = [
+            Group.objects.create(title=f'Группа {x}', slug=f'group_{x}')
+            for x in range(PAGINATION_NUM)
+        ]
+        Post.objects.bulk_create(
+            [
+                Post(text=f'Пост {x}', author=author, group=group)
+                for x, (author, group) in enumerate(zip(authors, groups))
+            ] + [
+                Post(text=f'Пост группы {x}', author=author, group=cls.group)
+                for x, author in enumerate(authors)
+            ] + [
+                Post(text=f'Пост автора {x}', author=cls.user, group=group)
+                for x, group in enumerate(groups)
+            ]
+        )
+        cls.post = Post.objects.filter(group__isnull=False).first()
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов при пустом кеше"""
+        budgets = {
+            reverse('posts:index'): 2,
+            reverse('posts:index') + '?page=2': 2,
+            reverse('posts:index') + '?cursor=': 1,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 2,
+            reverse(
+                'posts:profile', kwargs={'username': self.user.username}): 2,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 1,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_cached_views_fit_query_budget(self):
+        """Повторный запрос страницы берется из кешей почти без базы"""
+        budgets = {
+            reverse('posts:index'): 0,
+            reverse('posts:index') + '?page=2': 0,
+            reverse('posts:index') + '?cursor=': 0,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 0,
+            reverse(
+                'posts:profile', kwargs={'username': self.user.username}): 0,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 1,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with self.assertNumQueries(budget):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_count_estimate_follows_changes(self):
+        """Оценка числа постов в паджинаторе обновляется после изменений"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.guest_client.get(url)
+        count = response.context['page_obj'].paginator.count
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count, count + 1)
+        post.group = None
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count, count)
+
+    def test_fragment_cache_refreshed_on_edit(self):
+        """Отредактированный пост сразу виден в закешированных лентах"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        post = Post.objects.create(
+            text='Пост в группе', author=self.user, group=self.group)
+        for url in urls:
+            self.guest_client.get(url)
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Отредактированный пост', 'group': self.group.pk}
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Отредактированный пост')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменившиеся страницы отдают 304 без отрисовки шаблона"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.templates, [])
+
+    def test_changed_pages_return_200(self):
+        """После изменения поста страницы отдаются заново"""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Измененный пост'
+        post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_page_and_user(self):
+        """ETag разный для разных страниц ленты и пользователей"""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(
+            url, {'page': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_objects_return_404(self):
+        """Условный GET к несуществующим объектам отдает 404"""
+        urls = [
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cached_page_skips_view(self):
+        """Повторный запрос страницы берется из кеша без базы"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertEqual(
+            [template.name for template in second.templates],
+            ['includes/header.html'])
+        self.assertEqual(second.content, first.content)
+
+    def test_cached_page_has_personal_header(self):
+        """Вошедший пользователь видит свою шапку в общей странице"""
+        url = reverse('about:author')
+        guest = self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertNotContains(guest, 'Пользователь: TestUser')
+        self.assertContains(response, 'Пользователь: TestUser')
+        self.assertContains(response, reverse('posts:post_create'))
+        self.assertNotContains(response, '<!-- yatube:header -->')
+
+    def test_post_changes_invalidate_pages(self):
+        """Новый пост сбрасывает закешированные страницы"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertContains(self.guest_client.get(url), 'Новый пост')
+
+    def test_post_detail_cached_only_for_guests(self):
+        """Автор видит ссылку редактирования на странице поста"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.assertNotContains(self.guest_client.get(url), edit_url)
+        self.assertContains(self.authorized_client.get(url), edit_url)
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get_group(self, slug):
+        return views.get_group(self.factory.get('/'), slug)
+
+    def get_author(self, username):
+        return views.get_author(self.factory.get('/'), username)
+
+    def test_lookups_served_from_cache(self):
+        """Группа и автор повторно находятся по адресу без базы"""
+        self.get_group(self.group.slug)
+        self.get_author(self.user.username)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_group(self.group.slug), self.group)
+            self.assertEqual(self.get_author(self.user.username), self.user)
+
+    def test_missing_object_cached_until_created(self):
+        """Отсутствие группы кешируется и сбрасывается при ее создании"""
+        with self.assertRaises(Http404):
+            self.get_group('new_slug')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            self.get_group('new_slug')
+        group = Group.objects.create(title='Новая группа', slug='new_slug')
+        self.assertEqual(self.get_group('new_slug'), group)
+
+    def test_cached_objects_follow_changes(self):
+        """Кешированные группа и автор обновляются после изменений"""
+        self.get_group(self.group.slug)
+        self.get_author(self.user.username)
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        self.assertEqual(self.get_group(self.group.slug).posts_count, 1)
+        self.assertEqual(
+            self.get_author(self.user.username).stats.posts_count, 1)
+
+    def test_cached_author_has_no_credentials(self):
+        """Автор хранится в кеше объектов без пароля и почты"""
+        self.get_author(self.user.username)
+        with self.assertNumQueries(0):
+            author = self.get_author(self.user.username)
+        self.assertEqual(author.get_full_name(), self.user.get_full_name())
+        self.assertNotIn('password', author.__dict__)
+        self.assertNotIn('email', author.__dict__)
+
+    def test_login_keeps_cached_author(self):
+        """Вход автора не сбрасывает его запись в кеше объектов"""
+        self.get_author(self.user.username)
+        Client().force_login(self.user)
+        with self.assertNumQueries(0):
+            self.get_author(self.user.username)
+
+    def test_object_changed_during_read_not_cached(self):
+        """Группа, измененная между чтением и записью в кеш, не кешируется
+        устаревшей"""
+        self.get_group(self.group.slug)
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        first = QuerySet.first
+
+        def first_then_save(queryset):
+            obj = first(queryset)
+            group = Group.objects.get(pk=self.group.pk)
+            group.title = 'Новое название'
+            group.save()
+            return obj
+
+        with mock.patch.object(QuerySet, 'first', first_then_save):
+            self.assertEqual(
+                self.get_group(self.group.slug).title, 'Тестовая группа')
+        self.assertEqual(
+            self.get_group(self.group.slug).title, 'Новое название')
+
+    def test_renamed_and_deleted_objects(self):
+        """Старый адрес переименованного объекта больше не находится"""
+        self.get_group(self.group.slug)
+        self.get_author(self.user.username)
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'Renamed'
+        user.save()
+        with self.assertRaises(Http404):
+            self.get_author(self.user.username)
+        self.assertEqual(self.get_author('Renamed'), user)
+        Group.objects.filter(pk=self.group.pk).get().delete()
+        with self.assertRaises(Http404):
+            self.get_group(self.group.slug)
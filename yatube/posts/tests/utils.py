@@ -0,0 +1,11 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+
+def image_upload(name='image.png', size=(1200, 800), color='red'):
+    """Загружаемая PNG-картинка для форм и моделей в тестах."""
+    content = BytesIO()
+    Image.new('RGBA', size, color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
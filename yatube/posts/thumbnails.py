@@ -0,0 +1,125 @@
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from core import page_cache
+
+from . import cache, imaging
+from .models import Post
+
+logger = logging.getLogger('yatube.thumbnails')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Пул процессов, который делает копии картинок вне потока запроса.
+
+    Процессы запускаются через spawn: fork из многопоточного сервера
+    унес бы в дочерний процесс чужие блокировки и соединения с базой.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.THUMBNAIL_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def schedule(post_id, name):
+    """Ставит в очередь копии картинки поста, возвращает Future.
+
+    При THUMBNAIL_WORKERS = 0 копии делаются сразу в этом процессе.
+    Очередь живет в памяти процесса, поэтому картинки, не обработанные
+    до перезапуска, доделывает команда rebuild_thumbnails.
+    """
+    root = default_storage.path('')
+    variants = settings.POST_IMAGE_VARIANTS
+    if not settings.THUMBNAIL_WORKERS:
+        save_variants(
+            post_id, name, imaging.render_variants(root, name, variants))
+        return None
+    future = executor().submit(
+        imaging.render_variants, root, name, variants)
+    future.add_done_callback(partial(_finished, post_id, name))
+    return future
+
+
+def _finished(post_id, name, future):
+    # Вызывается в служебном потоке пула, у которого свои соединения.
+    try:
+        save_variants(post_id, name, future.result())
+    except Exception:
+        logger.exception('Не удалось сделать копии картинки %s', name)
+    finally:
+        connections.close_all()
+
+
+def save_variants(post_id, name, variants):
+    """Записывает копии посту, если картинка за это время не сменилась,
+    и сбрасывает кеш лент, где пост показан с заглушкой."""
+    updated = Post.objects.filter(pk=post_id, image=name).update(
+        image_variants=json.dumps(variants))
+    if not updated:
+        return False
+    post = Post.objects.values('author_id', 'group_id').get(pk=post_id)
+    cache.bump_feed_versions(
+        cache.post_feeds(post['author_id'], post['group_id']))
+    page_cache.bump_version()
+    return True
+
+
+def image_changed(post):
+    """Сбрасывает старые копии и после коммита ставит в очередь новые."""
+    if post.image_variants:
+        Post.objects.filter(pk=post.pk).update(image_variants='')
+        post.image_variants = ''
+        post.__dict__.pop('thumbnails', None)
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: schedule(post.pk, name))
+
+
+def rebuild(missing_only=True):
+    """Делает копии картинок постов заново, возвращает число готовых.
+
+    Картинки обрабатываются пулом параллельно, а сохраняются по порядку
+    в текущем потоке. Пост с битой картинкой пропускается.
+    """
+    posts = Post.objects.exclude(image='')
+    if missing_only:
+        posts = posts.filter(image_variants='')
+    rows = list(posts.order_by('pk').values_list('pk', 'image').iterator())
+    root = default_storage.path('')
+    variants = settings.POST_IMAGE_VARIANTS
+    if settings.THUMBNAIL_WORKERS:
+        renders = [
+            executor().submit(
+                imaging.render_variants, root, name, variants).result
+            for _, name in rows
+        ]
+    else:
+        renders = [
+            partial(imaging.render_variants, root, name, variants)
+            for _, name in rows
+        ]
+    done = 0
+    for (post_id, name), render in zip(rows, renders):
+        try:
+            rendered = render()
+        except Exception:
+            logger.exception('Не удалось сделать копии картинки %s', name)
+            continue
+        done += save_variants(post_id, name, rendered)
+    return done
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+CELEBRITIES_KEY = 'follow:celebrities'
+
+
+def celebrity_ids():
+    """id авторов, чьи посты подмешиваются в ленты подписок при чтении.
+
+    Таких авторов немного на весь сайт, поэтому список хранится в кеше
+    целиком и сбрасывается, когда в нем появляется новый автор.
+    """
+    ids = cache.get(CELEBRITIES_KEY)
+    if ids is None:
+        ids = list(AuthorStats.objects.filter(
+            merge_on_read=True).values_list('author_id', flat=True))
+        cache.set(CELEBRITIES_KEY, ids, None)
+    return ids
+
+
+def followed_celebrities(user_id):
+    """Авторы из celebrity_ids(), на которых подписан пользователь.
+
+    Запрос перебирает знаменитостей, а не подписки пользователя, так
+    что его цена не зависит от того, на скольких авторов он подписан.
+    """
+    ids = celebrity_ids()
+    if not ids:
+        return []
+    return list(
+        Follow.objects.filter(user_id=user_id, author_id__in=ids)
+        .values_list('author_id', flat=True)
+    )
+
+
+def mark_celebrity(author_id):
+    """Переводит автора на подмешивание при чтении, если подписчиков
+    стало больше FOLLOW_FANOUT_LIMIT."""
+    marked = AuthorStats.objects.filter(
+        author_id=author_id, merge_on_read=False,
+        followers_count__gt=settings.FOLLOW_FANOUT_LIMIT
+    ).update(merge_on_read=True)
+    if marked:
+        cache.delete(CELEBRITIES_KEY)
+        transaction.on_commit(lambda: cache.delete(CELEBRITIES_KEY))
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Ленты ограничены FOLLOW_TIMELINE_LENGTH записями, но обрезаются не
+    при каждой вставке: каждую ленту подрезает примерно каждый
+    FOLLOW_TIMELINE_TRIM_INTERVAL-й пришедший в нее пост.
+    """
+    if post.author_id in celebrity_ids():
+        return 0
+    follower_ids = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            user_id=user_id, post_id=post.pk, author_id=post.author_id,
+            pub_date=post.pub_date
+        ) for user_id in follower_ids
+    ])
+    interval = settings.FOLLOW_TIMELINE_TRIM_INTERVAL
+    for user_id in follower_ids:
+        if (user_id + post.pk) % interval == 0:
+            trim_timeline(user_id)
+    return len(follower_ids)
+
+
+def repush_post(post):
+    """Перекладывает пост, у которого сменился автор."""
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+    push_post(post)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if author_id in celebrity_ids():
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:settings.FOLLOW_TIMELINE_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            user_id=user_id, post_id=post_id, author_id=author_id,
+            pub_date=pub_date
+        ) for post_id, pub_date in posts
+    ], ignore_conflicts=True)
+    trim_timeline(user_id)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim_timeline(user_id):
+    """Оставляет в ленте FOLLOW_TIMELINE_LENGTH самых новых записей."""
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    length = settings.FOLLOW_TIMELINE_LENGTH
+    pivot = list(
+        entries.order_by('-pub_date', '-post_id')
+        .values_list('pub_date', 'post_id')[length:length + 1]
+    )
+    if not pivot:
+        return 0
+    pub_date, post_id = pivot[0]
+    deleted, _ = entries.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, post_id__lte=post_id)
+    ).delete()
+    return deleted
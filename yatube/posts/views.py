@@ -1,57 +1,218 @@
+import hashlib
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition, require_POST
+
+from core.db import pin_primary, primary_pin, read_from_replica
+from core.page_cache import cache_page_body, lag_window
 
-from yatube.settings import PAGINATION_NUM
+from yatube.settings import (PAGINATION_KEYSET, PAGINATION_NUM,
+                             POSTS_FRAGMENT_CACHE_TIMEOUT)
 
+from . import cache, search
 from .forms import PostForm
-from .models import Group, Post, User
+from .models import Follow, Group, Post, User
+from .paginators import (FollowFeedPaginator, KeysetPaginator,
+                         WindowPaginator, estimate_table_rows)
 
 
-def pagination(request, post_list, num_on_page):
-    paginator = Paginator(post_list, num_on_page)
+def pagination(request, post_list, num_on_page, estimate=None):
+    if PAGINATION_KEYSET or 'cursor' in request.GET:
+        paginator = KeysetPaginator(post_list, num_on_page)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = WindowPaginator(post_list, num_on_page, estimate)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+def feed_context(request, post_list, feed, estimate=None):
+    """Страница ленты и ключ кеша для фрагмента со списком постов.
+
+    estimate - примерное число постов ленты для окна номеров страниц.
+    Сразу после своей записи пользователь читает с основной базы, и
+    фрагмент кешируется под его меткой, а фрагмент с реплики сразу после
+    чужой записи - под меткой окна page_cache.lag_window().
+    """
+    pin = primary_pin(request) or lag_window()
+    version = cache.get_feed_version(feed)
+    return {
+        'page_obj': pagination(request, post_list, PAGINATION_NUM, estimate),
+        'feed': feed,
+        'feed_version': f'{version}:{pin}' if pin else version,
+        'fragment_timeout': POSTS_FRAGMENT_CACHE_TIMEOUT,
+    }
+
+
+def get_once(request, queryset, feed=None, **lookup):
+    """get_object_or_404, который ходит в базу один раз за запрос.
+
+    Объект страницы нужен и проверке условного GET, и самому view. С
+    feed объект ищется через кеш объектов (cache.get_object).
+    """
+    key = (queryset.model, tuple(lookup.items()))
+    objects = request.__dict__.setdefault('_page_objects', {})
+    if key not in objects:
+        if feed is None:
+            objects[key] = get_object_or_404(queryset, **lookup)
+        else:
+            obj = cache.get_object(queryset, feed, **lookup)
+            if obj is None:
+                raise Http404(
+                    f'No {queryset.model._meta.object_name} matches '
+                    'the given query.'
+                )
+            objects[key] = obj
+    return objects[key]
+
+
+def get_group(request, slug):
+    return get_once(
+        request, Group.objects.all(), cache.group_feed, slug=slug)
+
+
+def get_author(request, username):
+    # В кеш объектов автор попадает без пароля и почты.
+    authors = User.objects.select_related('stats').only(
+        'username', 'first_name', 'last_name',
+        'stats__posts_count', 'stats__followers_count'
+    )
+    return get_once(request, authors, cache.author_feed, username=username)
+
+
+def get_post(request, post_id):
+    return get_once(
+        request, Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
+
+
+def feed_condition(get_feeds):
+    """Отвечает 304 на условный GET, если ленты страницы не менялись.
+
+    get_feeds получает аргументы view и возвращает ленты, от которых
+    зависит страница. ETag учитывает версии лент, пользователя (от него
+    зависит шапка) и параметры запроса, Last-Modified - время последнего
+    изменения лент.
+    """
+    def get_versions(request, *args, **kwargs):
+        if not hasattr(request, '_feed_versions'):
+            request._feed_versions = [
+                cache.get_feed_version(feed)
+                for feed in get_feeds(request, *args, **kwargs)
+            ]
+        return request._feed_versions
+
+    def etag(request, *args, **kwargs):
+        versions = get_versions(request, *args, **kwargs)
+        key = f'{versions}:{request.user.pk}:{request.get_full_path()}'
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return cache.feed_last_modified(
+            get_versions(request, *args, **kwargs))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def group_feeds(request, slug):
+    return [cache.group_feed(get_group(request, slug).pk)]
+
+
+def author_feeds(request, username):
+    return [cache.author_feed(get_author(request, username).pk)]
+
+
+def post_feeds(request, post_id):
+    post = get_post(request, post_id)
+    feeds = [cache.author_feed(post.author_id)]
+    if post.group_id is not None:
+        feeds.append(cache.group_feed(post.group_id))
+    return feeds
+
+
+@read_from_replica
+@feed_condition(lambda request: [cache.INDEX_FEED])
+@cache_page_body
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
-    context = {
-        'page_obj': page_obj
-    }
+    post_list = Post.objects.select_related('author', 'group')
+    context = feed_context(
+        request, post_list, cache.INDEX_FEED,
+        lambda: estimate_table_rows(Post))
     return render(request, template, context)
 
 
+@read_from_replica
+@feed_condition(group_feeds)
+@cache_page_body
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
-    context = {
-        'group': group,
-        'page_obj': page_obj
-    }
+    group = get_group(request, slug)
+    post_list = group.posts.select_related('author')
+    context = feed_context(
+        request, post_list, cache.group_feed(group.pk), group.posts_count)
+    context['group'] = group
     return render(request, template, context)
 
 
+@read_from_replica
+@feed_condition(author_feeds)
+@cache_page_body(anonymous_only=True)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
+    author = get_author(request, username)
+    post_list = author.posts.select_related('group')
+    stats = getattr(author, 'stats', None)
+    context = feed_context(
+        request, post_list, cache.author_feed(author.pk),
+        stats.posts_count if stats else 0)
+    context['author'] = author
+    if request.user.is_authenticated and request.user != author:
+        context['following'] = Follow.objects.filter(
+            user=request.user, author=author).exists()
+    return render(request, template, context)
+
+
+@read_from_replica
+@cache_page_body
+def group_index(request):
+    template = 'posts/groups.html'
+    groups = Group.objects.select_related('last_post_author')
+    paginator = KeysetPaginator(
+        groups, PAGINATION_NUM, ordering=('title', 'id'))
     context = {
-        'author': author,
-        'page_obj': page_obj,
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
     }
     return render(request, template, context)
 
 
+@read_from_replica
+@cache_page_body
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    post_list = search.search_posts(
+        Post.objects.select_related('author', 'group'), query)
+    paginator = WindowPaginator(post_list, PAGINATION_NUM)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@feed_condition(post_feeds)
+@cache_page_body(anonymous_only=True)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post(request, post_id)
     context = {
         'post': post
     }
@@ -61,7 +222,7 @@ def post_detail(request, post_id):
 @login_required
 def post_create(request):
     groups = Group.objects.all()
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     context = {
         'form': form,
         'groups': groups
@@ -70,8 +231,10 @@ def post_create(request):
         return render(request, 'posts/create_post.html', context)
     instance = form.save(commit=False)
     instance.author = request.user
-    instance.save()
-    return redirect('posts:profile', username=request.user.username)
+    with transaction.atomic():
+        instance.save()
+    return pin_primary(
+        redirect('posts:profile', username=request.user.username))
 
 
 @login_required
@@ -79,7 +242,8 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
-    form = PostForm(request.POST or None, instance=post)
+    form = PostForm(
+        request.POST or None, files=request.FILES or None, instance=post)
     context = {
         'is_edit': True,
         'form': form,
@@ -87,5 +251,36 @@ def post_edit(request, post_id):
     }
     if not form.is_valid():
         return render(request, 'posts/create_post.html', context)
-    form.save()
-    return redirect('posts:post_detail', post_id=post_id)
+    with transaction.atomic():
+        form.save()
+    return pin_primary(redirect('posts:post_detail', post_id=post_id))
+
+
+@read_from_replica
+@login_required
+def follow_index(request):
+    template = 'posts/follow.html'
+    paginator = FollowFeedPaginator(request.user.pk, PAGINATION_NUM)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
+    }
+    return render(request, template, context)
+
+
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
+    return pin_primary(redirect('posts:profile', username=username))
+
+
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
+    return pin_primary(redirect('posts:profile', username=username))
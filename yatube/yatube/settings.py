@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,6 +46,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,9 +61,15 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Боевой режим шаблонов: кешированные загрузчики читают и разбирают
+# каждый шаблон один раз за процесс, шаблоны posts/ и includes/
+# разбираются при старте. По умолчанию включен вне DEBUG.
+TEMPLATE_CACHE = os.getenv('YATUBE_TEMPLATE_CACHE', str(not DEBUG)) == 'True'
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Тот же движок Django, но с замером отрисовки для профилирования.
+        'BACKEND': 'core.profiling.ProfiledDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +84,15 @@ TEMPLATES = [
     },
 ]
 
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -83,9 +103,77 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живет между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 60)),
     }
 }
 
+# Реплики только для чтения: YATUBE_DB_REPLICAS="/path/a.sqlite3,...".
+# Ленты и страницы постов читают с них, запись всегда идет в default.
+# В тестах реплики смотрят в тестовую базу default.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+# Приложения, чьи модели можно читать с реплик; сессии читаются с default.
+DATABASE_REPLICA_APPS = ('posts', 'auth')
+# Сколько секунд после своей записи пользователь читает с основной базы.
+DATABASE_PRIMARY_PIN_SECONDS = 10
+
+# Прагмы, которые выполняются на каждом новом соединении с SQLite.
+# WAL позволяет читать во время записи, busy_timeout (мс) заставляет
+# ждать блокировку вместо ошибки "database is locked", NORMAL в WAL
+# безопасен и не синхронизирует диск на каждый коммит, mmap_size (байты)
+# и cache_size (отрицательное значение - в КиБ) держат горячие страницы
+# в памяти. busy_timeout идет первым: смена журнала тоже ждет блокировку.
+# Пустой словарь оставляет настройки SQLite по умолчанию.
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.getenv('YATUBE_SQLITE_BUSY_TIMEOUT', 5000)),
+    'journal_mode': os.getenv('YATUBE_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('YATUBE_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.getenv('YATUBE_SQLITE_MMAP_SIZE', 256 * 1024 ** 2)),
+    'cache_size': int(os.getenv('YATUBE_SQLITE_CACHE_SIZE', -64 * 1024)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Кеш должен быть общим для всех процессов сервера: версии лент, кеш
+# страниц и объектов сбрасываются в процессе, который принял запись, а
+# читаются во всех. Кеш в памяти процесса (LocMemCache) годится только
+# для отладки и тестов, без DEBUG с ним сервер не запустится. По
+# умолчанию это файловый кеш, общий для процессов на одной машине; для
+# нескольких машин нужен memcached: YATUBE_CACHE_BACKEND и
+# YATUBE_CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'YATUBE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION',
+            'yatube' if DEBUG else os.path.join(BASE_DIR, 'cache')
+        ),
+    }
+}
+
+# Сколько секунд хранится в кеше число постов ленты для паджинатора.
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 5
+# Сколько секунд хранится отрисованный список постов страницы ленты.
+POSTS_FRAGMENT_CACHE_TIMEOUT = 60 * 5
+# Сколько секунд хранится страница целиком (без персональной шапки).
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Сколько секунд хранятся группа и автор страницы, найденные по адресу,
+# и сколько - отметка о том, что по адресу никого нет.
+OBJECT_CACHE_TIMEOUT = 60 * 10
+OBJECT_CACHE_MISS_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -127,6 +215,23 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic собирает сюда файлы с хешем в имени и их .gz/.br копии.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Копии картинок постов: вариант -> (ширина, высота, обрезать по рамке).
+POST_IMAGE_VARIANTS = {
+    'feed': (960, 339, True),
+    'detail': (960, 960, False),
+}
+# Сколько процессов делает копии картинок; 0 - делать их сразу, в
+# процессе, который сохранил пост.
+THUMBNAIL_WORKERS = int(os.getenv('YATUBE_THUMBNAIL_WORKERS', 2))
+
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -137,3 +242,68 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGINATION_NUM = 10
+# Сколько номеров страниц паджинатор показывает по обе стороны от текущей.
+PAGINATION_WINDOW = 3
+# Постраничный вывод лент по ключу (pub_date, id) вместо OFFSET.
+# Включается для всего сайта здесь или для запроса параметром ?cursor=
+PAGINATION_KEYSET = False
+
+# Лента подписок: сколько последних постов хранится у каждого читателя,
+# как часто (примерно раз в столько пришедших постов) лента обрезается
+# до этой длины и со скольких подписчиков посты автора не раскладываются
+# по лентам, а подмешиваются при чтении.
+FOLLOW_TIMELINE_LENGTH = 1000
+FOLLOW_TIMELINE_TRIM_INTERVAL = 100
+FOLLOW_FANOUT_LIMIT = 5000
+
+# Какая доля запросов профилируется (SQL, шаблоны, Python): такие ответы
+# получают заголовок Server-Timing, а в лог yatube.profiling уходит
+# строка JSON. 0 выключает профилирование, по умолчанию оно идет вне DEBUG.
+PROFILING_SAMPLE_RATE = float(
+    os.getenv('YATUBE_PROFILING_SAMPLE_RATE', 0 if DEBUG else 0.01))
+
+# Каталог, где каждый процесс держит файл своих метрик; /metrics
+# складывает все файлы. Общий для всех воркеров, чистится при деплое.
+METRICS_DIR = os.getenv(
+    'YATUBE_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics'))
+
+# /metrics открыт только адресам из METRICS_ALLOWED_IPS или запросам
+# с заголовком Authorization: Bearer <METRICS_TOKEN>.
+METRICS_ALLOWED_IPS = os.getenv(
+    'YATUBE_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+
+# Запросы к базе дольше порога (мс) пишутся в лог yatube.db.slow вместе
+# с view и кадрами проекта, а из файла SLOW_QUERY_LOG их сводит команда
+# slow_queries. Пустое значение выключает запись.
+SLOW_QUERY_THRESHOLD_MS = os.getenv('YATUBE_SLOW_QUERY_MS', '200')
+SLOW_QUERY_THRESHOLD_MS = (
+    float(SLOW_QUERY_THRESHOLD_MS) if SLOW_QUERY_THRESHOLD_MS else None)
+SLOW_QUERY_LOG = os.getenv(
+    'YATUBE_SLOW_QUERY_LOG', os.path.join(BASE_DIR, 'slow_queries.log'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(name)s %(message)s'},
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+        # Файл открывается при первой записи, строка - один JSON.
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube': {'handlers': ['console'], 'level': 'INFO'},
+        'yatube.db.slow': {
+            'handlers': ['slow_queries'], 'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}